@@ -119,6 +119,8 @@ class Settings(BaseSettings):
     ctf_end_time: str | None = None
     flag_prefix: str = "CERB{"
     flag_suffix: str = "}"
+    # Solves only change the solver's score (no dynamic decay)
+    leaderboard_static_scoring: bool = False
     
     # ==========================================================================
     # Anti-cheat
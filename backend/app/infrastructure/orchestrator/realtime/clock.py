@@ -0,0 +1,36 @@
+"""
+Clock Helpers
+
+Cheap UTC timestamp formatting for real-time hot paths. Events recorded
+within the same second share a single pre-formatted ISO 8601 string
+instead of allocating and formatting a new datetime each time.
+"""
+
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+# (epoch second, ISO string) of the last formatted timestamp
+_iso_cache: Tuple[int, str] = (-1, "")
+
+
+def utc_isoformat(timestamp: Optional[float] = None) -> str:
+    """
+    Format a UTC epoch timestamp as ISO 8601 with second resolution.
+    
+    Args:
+        timestamp: Epoch seconds (defaults to now)
+    
+    Returns:
+        ISO 8601 string, e.g. "2024-01-01T12:00:00"
+    """
+    global _iso_cache
+    
+    second = int(time.time() if timestamp is None else timestamp)
+    cached_second, cached_iso = _iso_cache
+    if cached_second == second:
+        return cached_iso
+    
+    iso = datetime.utcfromtimestamp(second).isoformat()
+    _iso_cache = (second, iso)
+    return iso
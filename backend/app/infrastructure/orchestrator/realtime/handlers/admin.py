@@ -10,7 +10,10 @@ Manages admin monitoring dashboards with:
 """
 
 import asyncio
-from datetime import datetime, timedelta
+import bisect
+import time
+from collections import Counter
+from datetime import datetime
 from typing import Any, Dict, List, Optional, Set
 from uuid import UUID
 
@@ -18,6 +21,7 @@ import structlog
 
 from app.infrastructure.cache import CacheManager
 from app.infrastructure.database import DatabaseManager
+from app.infrastructure.orchestrator.realtime.clock import utc_isoformat
 
 logger = structlog.get_logger(__name__)
 
@@ -45,12 +49,28 @@ class AdminHandler:
         
         # Statistics storage
         self._active_users: Set[UUID] = set()
+        self._active_user_uuids: Dict[str, UUID] = {}  # Parsed Redis members
         self._connection_history: List[Dict[str, Any]] = []
         self._solve_history: List[Dict[str, Any]] = []
+        self._solve_times: List[float] = []  # Epoch seconds, parallel to _solve_history
         self._system_stats_history: List[Dict[str, Any]] = []
+        self._challenge_counts: Counter = Counter()
+        
+        # Audit log retention (trimmed lazily past the threshold)
+        self._audit_log_max_size = 10000
+        self._audit_log_trim_threshold = 11000
+        self._admin_audit_log_max_size = 1000
+        
+        # Short-lived game state memo (invalidated on update_game_state)
+        self._game_state_cache: Optional[Dict[str, Any]] = None
+        self._game_state_ts = 0.0
+        self._game_state_ttl = 1.0
         
         # Monitoring tasks
         self._monitor_task: Optional[asyncio.Task] = None
+        self._monitor_wakeup = asyncio.Event()
+        self._monitor_interval = 60
+        self._monitor_backoff = 1
         self._running = False
         
         logger.info("AdminHandler initialized")
@@ -58,12 +78,14 @@ class AdminHandler:
     async def start(self) -> None:
         """Start background monitoring tasks."""
         self._running = True
+        self._monitor_wakeup.clear()
         self._monitor_task = asyncio.create_task(self._monitor_worker())
         logger.info("AdminHandler started")
     
     async def stop(self) -> None:
         """Stop background monitoring tasks."""
         self._running = False
+        self._monitor_wakeup.set()
         
         if self._monitor_task:
             self._monitor_task.cancel()
@@ -88,12 +110,9 @@ class AdminHandler:
         """Register a user as active."""
         self._active_users.add(user_id)
         
-        # Store in Redis for distributed tracking
-        await self.cache.redis_client.hset(
-            "active_users",
-            str(user_id),
-            username,
-        )
+        # Store in Redis for distributed tracking (membership only;
+        # usernames live under user:{uuid})
+        await self.cache.redis_client.sadd("active_users", str(user_id))
         
         await self._record_connection_event("connect", user_id, username, team_id, role)
     
@@ -104,7 +123,7 @@ class AdminHandler:
         """Unregister an active user."""
         self._active_users.discard(user_id)
         
-        await self.cache.redis_client.hdel("active_users", str(user_id))
+        await self.cache.redis_client.srem("active_users", str(user_id))
         
         # Get username for history
         username = await self.cache.redis_client.hget("user_usernames", str(user_id))
@@ -131,7 +150,7 @@ class AdminHandler:
     async def get_active_users_count(self) -> int:
         """Get count of active users."""
         # Try Redis first for distributed count
-        redis_count = await self.cache.redis_client.hlen("active_users")
+        redis_count = await self.cache.redis_client.scard("active_users")
         if redis_count > 0:
             return redis_count
         return len(self._active_users)
@@ -151,7 +170,7 @@ class AdminHandler:
             "username": username,
             "team_id": str(team_id) if team_id else None,
             "role": role,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": utc_isoformat(),
         }
         
         self._connection_history.append(event)
@@ -179,20 +198,30 @@ class AdminHandler:
         is_first_blood: bool = False,
     ) -> None:
         """Record a challenge solve."""
+        solved_at = time.time()
         event = {
             "user_id": str(user_id),
             "team_id": str(team_id) if team_id else None,
             "challenge_id": str(challenge_id),
             "points": points,
             "is_first_blood": is_first_blood,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": utc_isoformat(solved_at),
         }
         
         self._solve_history.append(event)
+        self._solve_times.append(solved_at)
+        self._challenge_counts[event["challenge_id"]] += 1
         
-        # Trim history
+        # Trim history, keeping per-challenge counts in step with the window
         if len(self._solve_history) > self.stats_history_size:
+            overflow = len(self._solve_history) - self.stats_history_size
+            for dropped in self._solve_history[:overflow]:
+                challenge_key = dropped["challenge_id"]
+                self._challenge_counts[challenge_key] -= 1
+                if self._challenge_counts[challenge_key] <= 0:
+                    del self._challenge_counts[challenge_key]
             self._solve_history = self._solve_history[-self.stats_history_size:]
+            self._solve_times = self._solve_times[-self.stats_history_size:]
         
         # Store in Redis
         await self.cache.redis_client.lpush(
@@ -210,12 +239,11 @@ class AdminHandler:
         time_range_hours: int = 24,
     ) -> Dict[str, Any]:
         """Get solve statistics for a time range."""
-        cutoff = datetime.utcnow() - timedelta(hours=time_range_hours)
+        cutoff = time.time() - time_range_hours * 3600
         
-        # Filter solves by time range
-        recent_solves = [
-            s for s in self._solve_history
-            if datetime.fromisoformat(s["timestamp"]) > cutoff
+        # Filter solves by time range (history is chronological)
+        recent_solves = self._solve_history[
+            bisect.bisect_right(self._solve_times, cutoff):
         ]
         
         # Group by hour
@@ -238,13 +266,8 @@ class AdminHandler:
     
     async def get_challenge_solve_counts(self) -> Dict[str, int]:
         """Get solve count per challenge."""
-        counts = {}
-        
-        for solve in self._solve_history:
-            challenge_id = solve["challenge_id"]
-            counts[challenge_id] = counts.get(challenge_id, 0) + 1
-        
-        return counts
+        # Maintained incrementally by record_solve
+        return dict(self._challenge_counts)
     
     # =========================================================================
     # System Health
@@ -252,14 +275,15 @@ class AdminHandler:
     
     async def get_system_stats(self) -> Dict[str, Any]:
         """Get current system statistics."""
-        # Get Redis stats
-        info = await self.cache.redis_client.info("stats")
-        
-        # Get memory usage
-        memory = await self.cache.redis_client.info("memory")
+        # Get Redis stats, memory usage and active user count concurrently
+        info, memory, active_users = await asyncio.gather(
+            self.cache.redis_client.info("stats"),
+            self.cache.redis_client.info("memory"),
+            self.get_active_users_count(),
+        )
         
         stats = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": utc_isoformat(),
             "redis": {
                 "connected_clients": info.get("connected_clients", 0),
                 "total_connections_received": info.get("total_connections_received", 0),
@@ -267,7 +291,7 @@ class AdminHandler:
                 "used_memory": memory.get("used_memory", 0),
                 "used_memory_human": memory.get("used_memory_human", "0"),
             },
-            "active_users": await self.get_active_users_count(),
+            "active_users": active_users,
             "recent_solves": len(self._solve_history),
             "connection_events": len(self._connection_history),
         }
@@ -279,9 +303,13 @@ class AdminHandler:
         
         return stats
     
-    async def get_system_health(self) -> Dict[str, Any]:
-        """Get system health status."""
-        stats = await self.get_system_stats()
+    async def get_system_health(
+        self,
+        stats: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Get system health status, optionally from already fetched stats."""
+        if stats is None:
+            stats = await self.get_system_stats()
         
         # Check thresholds
         memory_mb = stats["redis"]["used_memory"] / (1024 * 1024)
@@ -308,27 +336,64 @@ class AdminHandler:
     
     async def get_game_state(self) -> Dict[str, Any]:
         """Get current game state for admin dashboard."""
-        return {
-            "start_time": await self.cache.redis_client.get("game_start_time"),
-            "end_time": await self.cache.redis_client.get("game_end_time"),
-            "paused": await self.cache.redis_client.get("game_paused") == "true",
-            "scoreboard_frozen": await self.cache.redis_client.get("scoreboard_frozen") == "true",
-            "anonymous_mode": await self.cache.redis_client.get("anonymous_mode") == "true",
-            "current_tick": await self.cache.redis_client.get("ad_current_tick"),
-            "teams_count": await self.cache.redis_client.scard("active_teams"),
-            "challenges_count": await self.cache.redis_client.scard("active_challenges"),
+        if (
+            self._game_state_cache is not None
+            and time.monotonic() - self._game_state_ts < self._game_state_ttl
+        ):
+            # Callers get their own copy; the values are all scalars
+            return dict(self._game_state_cache)
+        
+        # Fetch all fields in a single round-trip
+        pipe = self.cache.redis_client.pipeline(transaction=False)
+        pipe.get("game_start_time")
+        pipe.get("game_end_time")
+        pipe.get("game_paused")
+        pipe.get("scoreboard_frozen")
+        pipe.get("anonymous_mode")
+        pipe.get("ad_current_tick")
+        pipe.scard("active_teams")
+        pipe.scard("active_challenges")
+        (
+            start_time,
+            end_time,
+            paused,
+            scoreboard_frozen,
+            anonymous_mode,
+            current_tick,
+            teams_count,
+            challenges_count,
+        ) = await pipe.execute()
+        
+        state = {
+            "start_time": start_time,
+            "end_time": end_time,
+            "paused": paused == "true",
+            "scoreboard_frozen": scoreboard_frozen == "true",
+            "anonymous_mode": anonymous_mode == "true",
+            "current_tick": current_tick,
+            "teams_count": teams_count,
+            "challenges_count": challenges_count,
         }
+        
+        self._game_state_cache = state
+        self._game_state_ts = time.monotonic()
+        
+        return dict(state)
     
     async def update_game_state(
         self,
         updates: Dict[str, Any],
     ) -> None:
         """Update game state."""
+        pipe = self.cache.redis_client.pipeline(transaction=False)
         for key, value in updates.items():
             if value is None:
-                await self.cache.redis_client.delete(f"game_{key}")
+                pipe.delete(f"game_{key}")
             else:
-                await self.cache.redis_client.set(f"game_{key}", str(value))
+                pipe.set(f"game_{key}", str(value))
+        await pipe.execute()
+        
+        self._game_state_cache = None
         
         logger.info("Game state updated", updates=updates)
     
@@ -351,18 +416,24 @@ class AdminHandler:
             "target_type": target_type,
             "target_id": target_id,
             "details": details or {},
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": utc_isoformat(),
             "ip_address": None,  # Should be passed from request context
         }
         
-        # Store in Redis list with expiration
-        await self.cache.redis_client.lpush(
-            "admin_audit_log",
-            log_entry,
-        )
-        
-        # Trim to last 10000 entries
-        await self.cache.redis_client.ltrim("admin_audit_log", 0, 9999)
+        # Store in the global list and the per-admin index in one round-trip
+        admin_key = f"admin_audit_log:{admin_id}"
+        pipe = self.cache.redis_client.pipeline(transaction=False)
+        pipe.lpush("admin_audit_log", log_entry)
+        pipe.lpush(admin_key, log_entry)
+        pipe.ltrim(admin_key, 0, self._admin_audit_log_max_size - 1)
+        audit_log_length, _, _ = await pipe.execute()
+        
+        # Trim back to the last 10000 entries only once the list has
+        # overshot the cap, instead of reshaping it on every write
+        if audit_log_length > self._audit_log_trim_threshold:
+            await self.cache.redis_client.ltrim(
+                "admin_audit_log", 0, self._audit_log_max_size - 1
+            )
         
         logger.info(
             "Admin action logged",
@@ -378,11 +449,11 @@ class AdminHandler:
         action_type: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
         """Get audit log entries."""
-        logs = await self.cache.redis_client.lrange("admin_audit_log", 0, limit - 1)
+        # Per-admin reads go straight to that admin's index
+        key = f"admin_audit_log:{admin_id}" if admin_id else "admin_audit_log"
+        logs = await self.cache.redis_client.lrange(key, 0, limit - 1)
         
         # Filter if needed
-        if admin_id:
-            logs = [l for l in logs if l.get("admin_id") == str(admin_id)]
         if action_type:
             logs = [l for l in logs if l.get("action") == action_type]
         
@@ -396,20 +467,49 @@ class AdminHandler:
         """Background worker for periodic monitoring tasks."""
         while self._running:
             try:
-                # Record system stats every minute
-                await self.get_system_stats()
+                # Record system stats every minute and update active
+                # users list from Redis concurrently
+                _, redis_users = await asyncio.gather(
+                    self.get_system_stats(),
+                    self.cache.redis_client.smembers("active_users"),
+                )
                 
-                # Update active users list from Redis
-                redis_users = await self.cache.redis_client.hgetall("active_users")
-                self._active_users = {UUID(u) for u in redis_users.keys()}
+                # Reuse UUIDs parsed on earlier ticks; members that left the
+                # set drop out of the cache with the rebuild
+                cached_uuids = self._active_user_uuids
+                parsed_uuids: Dict[str, UUID] = {}
+                for member in redis_users:
+                    user_uuid = cached_uuids.get(member)
+                    if user_uuid is None:
+                        user_uuid = UUID(member)
+                    parsed_uuids[member] = user_uuid
+                self._active_user_uuids = parsed_uuids
+                self._active_users = set(parsed_uuids.values())
                 
-                await asyncio.sleep(60)
+                self._monitor_backoff = 1
+                
+                # Sleep until the next tick, or until stop() wakes us up
+                try:
+                    await asyncio.wait_for(
+                        self._monitor_wakeup.wait(),
+                        timeout=self._monitor_interval,
+                    )
+                except asyncio.TimeoutError:
+                    pass
                 
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.exception("Monitor worker error", error=str(e))
-                await asyncio.sleep(5)
+                # Back off exponentially so a broken Redis is not hammered
+                self._monitor_backoff = min(
+                    self._monitor_backoff * 2, self._monitor_interval
+                )
+                logger.exception(
+                    "Monitor worker error",
+                    error=str(e),
+                    retry_in=self._monitor_backoff,
+                )
+                await asyncio.sleep(self._monitor_backoff)
     
     # =========================================================================
     # Dashboard Data
@@ -417,13 +517,19 @@ class AdminHandler:
     
     async def get_dashboard_summary(self) -> Dict[str, Any]:
         """Get summary data for admin dashboard."""
+        system, game, solves_24h = await asyncio.gather(
+            self.get_system_stats(),
+            self.get_game_state(),
+            self.get_solve_stats(24),
+        )
+        
         return {
-            "system": await self.get_system_stats(),
-            "health": await self.get_system_health(),
-            "game": await self.get_game_state(),
-            "solves_24h": await self.get_solve_stats(24),
-            "active_users": await self.get_active_users_count(),
-            "timestamp": datetime.utcnow().isoformat(),
+            "system": system,
+            "health": await self.get_system_health(stats=system),
+            "game": game,
+            "solves_24h": solves_24h,
+            "active_users": system["active_users"],
+            "timestamp": utc_isoformat(),
         }
     
     async def get_solves_timeline(
@@ -432,47 +538,53 @@ class AdminHandler:
         granularity_minutes: int = 15,
     ) -> List[Dict[str, Any]]:
         """Get timeline of solves for graphing."""
-        cutoff = datetime.utcnow() - timedelta(hours=time_range_hours)
+        cutoff = time.time() - time_range_hours * 3600
+        bucket_seconds = granularity_minutes * 60
         
-        # Group solves by time bucket
-        timeline: Dict[str, Dict[str, Any]] = {}
+        # History is chronological, so the window starts at a bisected index
+        start = bisect.bisect_left(self._solve_times, cutoff)
         
-        for solve in self._solve_history:
-            solve_time = datetime.fromisoformat(solve["timestamp"])
-            if solve_time < cutoff:
-                continue
+        # Group solves by time bucket (epoch seconds of the bucket start)
+        timeline: Dict[int, Dict[str, Any]] = {}
             
-            # Calculate bucket
-            bucket_minute = (solve_time.minute // granularity_minutes) * granularity_minutes
-            bucket_key = solve_time.replace(
-                minute=bucket_minute,
-                second=0,
-                microsecond=0,
-            ).isoformat()
+        for solved_at, solve in zip(
+            self._solve_times[start:],
+            self._solve_history[start:],
+        ):
+            # Buckets restart at the top of every hour
+            hour_start = int(solved_at) // 3600 * 3600
+            minute = (int(solved_at) - hour_start) // 60
+            bucket = hour_start + (minute // granularity_minutes) * bucket_seconds
             
-            if bucket_key not in timeline:
-                timeline[bucket_key] = {
-                    "timestamp": bucket_key,
+            entry = timeline.get(bucket)
+            if entry is None:
+                entry = timeline[bucket] = {
+                    "timestamp": datetime.utcfromtimestamp(bucket).isoformat(),
                     "solves": 0,
                     "points": 0,
                     "first_bloods": 0,
                 }
             
-            timeline[bucket_key]["solves"] += 1
-            timeline[bucket_key]["points"] += solve["points"]
+            entry["solves"] += 1
+            entry["points"] += solve["points"]
             if solve["is_first_blood"]:
-                timeline[bucket_key]["first_bloods"] += 1
+                entry["first_bloods"] += 1
         
         return sorted(timeline.values(), key=lambda x: x["timestamp"])
     
     async def get_challenge_difficulty_stats(self) -> Dict[str, Any]:
         """Get challenge difficulty statistics."""
-        # Group challenges by solve count
-        solve_counts = await self.get_challenge_solve_counts()
-        
-        easy = sum(1 for c in solve_counts.values() if c >= 10)
-        medium = sum(1 for c in solve_counts.values() if 1 <= c < 10)
-        hard = sum(1 for c in solve_counts.values() if c == 0)
+        # Group challenges by solve count in a single pass
+        solve_counts = self._challenge_counts
+        
+        easy = medium = hard = 0
+        for count in solve_counts.values():
+            if count >= 10:
+                easy += 1
+            elif count >= 1:
+                medium += 1
+            else:
+                hard += 1
         
         return {
             "easy_solves": easy,
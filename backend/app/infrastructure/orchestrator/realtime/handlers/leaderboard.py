@@ -8,13 +8,14 @@ Manages real-time leaderboard updates with:
 - Materialized view refresh triggers
 """
 
-from datetime import datetime
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 from uuid import UUID
 
 import structlog
 
+from app.core.config import get_settings
 from app.infrastructure.database import DatabaseManager
+from app.infrastructure.orchestrator.realtime.clock import utc_isoformat
 
 logger = structlog.get_logger(__name__)
 
@@ -34,10 +35,19 @@ class LeaderboardHandler:
         self,
         db_manager: DatabaseManager,
         cache_prefix: str = "leaderboard",
+        static_scoring: Optional[bool] = None,
     ):
         self.db_manager = db_manager
         self.cache_prefix = cache_prefix
+        # With static scoring a solve changes only the solver's score, so
+        # solve diffs can scan just the ranks that team moved across
+        if static_scoring is None:
+            static_scoring = get_settings().leaderboard_static_scoring
+        self._static_scoring = static_scoring
         self._previous_state: Dict[str, Any] = {}
+        # Displayed position (ties share one) and list index per team
+        self._previous_positions: Dict[str, int] = {}
+        self._previous_indices: Dict[str, int] = {}
         self._frozen = False
         self._frozen_state: Optional[Dict[str, Any]] = None
         self._anonymous_mode = False
@@ -78,7 +88,7 @@ class LeaderboardHandler:
             result = {
                 "entries": [],
                 "total": 0,
-                "last_updated": datetime.utcnow().isoformat(),
+                "last_updated": utc_isoformat(),
             }
             
             return result
@@ -86,32 +96,43 @@ class LeaderboardHandler:
     async def compute_diff(
         self,
         new_entries: List[Dict[str, Any]],
+        changed_team_id: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Compute diff between current and previous leaderboard state.
         
+        Args:
+            new_entries: Current leaderboard entries in rank order
+            changed_team_id: Only team whose score changed since the previous
+                state. Limits the scan to the ranks it moved across, so pass
+                it only when no other score can have changed.
+        
         Returns:
             Diff data containing only changed positions
         """
         if not self._previous_state:
             # First load - return full leaderboard
+            self._store_state(new_entries)
             return {
                 "type": "full",
                 "entries": new_entries,
                 "changed_positions": [],
             }
         
-        # Build position lookup from previous state
-        previous_positions = {
-            entry.get("team_id"): entry.get("position", i + 1)
-            for i, entry in enumerate(self._previous_state.get("entries", []))
-        }
+        previous_positions = self._previous_positions
+        previous_indices = self._previous_indices
+        
+        # A single team's solve only reorders the ranks between its old and
+        # new position; everything outside that slice is unchanged
+        changed_range = self._changed_range(new_entries, changed_team_id)
+        lo, hi = changed_range if changed_range else (0, len(new_entries))
         
         # Compute changes
         changed_positions = []
-        for i, entry in enumerate(new_entries):
+        for i in range(lo, hi):
+            entry = new_entries[i]
             team_id = entry.get("team_id")
-            new_position = i + 1
+            new_position = entry.get("position", i + 1)
             old_position = previous_positions.get(team_id)
             
             if old_position is None:
@@ -132,17 +153,79 @@ class LeaderboardHandler:
                 })
         
         # Store previous state
-        self._previous_state = {
-            "entries": new_entries,
-            "timestamp": datetime.utcnow().isoformat(),
-        }
+        if changed_range:
+            for i in range(lo, hi):
+                entry = new_entries[i]
+                team_id = entry.get("team_id")
+                previous_positions[team_id] = entry.get("position", i + 1)
+                previous_indices[team_id] = i
+            self._previous_state = {
+                "entries": new_entries,
+                "timestamp": utc_isoformat(),
+            }
+        else:
+            self._store_state(new_entries)
         
         return {
             "type": "diff",
             "entries": changed_positions,
             "total_teams": len(new_entries),
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": utc_isoformat(),
+        }
+    
+    def _store_state(self, entries: List[Dict[str, Any]]) -> None:
+        """Store entries as the previous state and rebuild the position lookups."""
+        self._previous_state = {
+            "entries": entries,
+            "timestamp": utc_isoformat(),
+        }
+        self._previous_positions = {
+            entry.get("team_id"): entry.get("position", i + 1)
+            for i, entry in enumerate(entries)
         }
+        self._previous_indices = {
+            entry.get("team_id"): i
+            for i, entry in enumerate(entries)
+        }
+    
+    def _changed_range(
+        self,
+        new_entries: List[Dict[str, Any]],
+        team_id: Optional[str],
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Get the index range a single team moved across since the previous state.
+        
+        Returns:
+            (lo, hi) slice bounds, or None if a full scan is required
+        """
+        if team_id is None:
+            return None
+        if len(new_entries) != len(self._previous_state.get("entries", [])):
+            return None
+        
+        # Slice bounds come from the list index; tied ranks share a position
+        old_index = self._previous_indices.get(team_id)
+        if old_index is None or old_index >= len(new_entries):
+            return None
+        
+        # Teams that were tied with it further down drop one position
+        # without moving, so they are part of the changed range too
+        previous_positions = self._previous_positions
+        old_position = previous_positions.get(team_id)
+        hi = old_index + 1
+        while (
+            hi < len(new_entries)
+            and previous_positions.get(new_entries[hi].get("team_id")) == old_position
+        ):
+            hi += 1
+        
+        # A solve can only move the team up, so walk towards rank 1
+        for new_index in range(old_index, -1, -1):
+            if new_entries[new_index].get("team_id") == team_id:
+                return new_index, hi
+        
+        return None
     
     def _anonymize_entry(self, entry: Dict[str, Any]) -> Dict[str, Any]:
         """Anonymize a leaderboard entry."""
@@ -167,7 +250,7 @@ class LeaderboardHandler:
         
         return {
             "frozen": True,
-            "frozen_at": datetime.utcnow().isoformat(),
+            "frozen_at": utc_isoformat(),
             "entries": self._frozen_state.get("entries", []),
         }
     
@@ -181,7 +264,7 @@ class LeaderboardHandler:
         
         return {
             "frozen": False,
-            "unfrozen_at": datetime.utcnow().isoformat(),
+            "unfrozen_at": utc_isoformat(),
             "entries": frozen_state.get("entries", []) if frozen_state else [],
         }
     
@@ -220,7 +303,10 @@ class LeaderboardHandler:
         
         # Get current leaderboard and compute diff
         leaderboard = await self.get_current_leaderboard()
-        diff = await self.compute_diff(leaderboard.get("entries", []))
+        diff = await self.compute_diff(
+            leaderboard.get("entries", []),
+            changed_team_id=str(team_id) if self._static_scoring else None,
+        )
         
         return diff
     
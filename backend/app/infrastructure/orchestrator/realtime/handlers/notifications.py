@@ -9,13 +9,19 @@ Manages real-time notifications with:
 """
 
 import asyncio
+import math
+import time
+from collections import Counter, deque
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Set
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple, Union
 from uuid import UUID, uuid4
 
+import orjson
 import structlog
+from cachetools import TTLCache
+from redis.commands.core import AsyncScript
 
 from app.infrastructure.cache import CacheManager
 from app.infrastructure.database import DatabaseManager
@@ -52,22 +58,159 @@ class NotificationChannel(str, Enum):
     WEBHOOK = "webhook"
 
 
-@dataclass
+# Plain string forms of enum members used on hot paths
+_CHANNEL_IN_APP = NotificationChannel.IN_APP.value
+_CHANNEL_EMAIL = NotificationChannel.EMAIL.value
+_CHANNEL_PUSH = NotificationChannel.PUSH.value
+_CHANNEL_WEBHOOK = NotificationChannel.WEBHOOK.value
+_PRIORITY_LOW = NotificationPriority.LOW.value
+_PRIORITY_NORMAL = NotificationPriority.NORMAL.value
+_PRIORITY_URGENT = NotificationPriority.URGENT.value
+_TYPE_ANNOUNCEMENT = NotificationType.ANNOUNCEMENT.value
+_TYPE_SYSTEM = NotificationType.SYSTEM.value
+
+# Shared (immutable) default channel list
+_DEFAULT_CHANNELS: Tuple[str, ...] = (_CHANNEL_IN_APP,)
+
+# Per-user state is split into shards by the low bits of the user UUID
+_SHARD_COUNT = 16
+_SHARD_MASK = _SHARD_COUNT - 1
+
+# dnd:{user_id} holds "1" for DND without an end, otherwise the epoch
+# second it ends at (the key also expires then)
+_DND_INDEFINITE = "1"
+
+
+def _dnd_until(value: Optional[str]) -> float:
+    """Epoch second a stored DND value ends at (0 when not set, inf for no end)."""
+    if value is None:
+        return 0.0
+    if value == _DND_INDEFINITE:
+        return math.inf
+    return float(value)
+
+
+# Digest summary labels per notification type
+_DIGEST_TYPE_LABELS: Dict[str, str] = {
+    NotificationType.FIRST_BLOOD.value: "First Bloods",
+    NotificationType.CHALLENGE_UNLOCK.value: "Unlocked Challenges",
+    NotificationType.CHALLENGE_SOLVE.value: "Challenge Solves",
+    NotificationType.TEAM_INVITE.value: "Team Invites",
+    NotificationType.ANNOUNCEMENT.value: "Announcements",
+    NotificationType.SYSTEM.value: "System Messages",
+}
+
+
+# Per-user notifications are stored as a hash of id -> JSON payload
+# (notifications:{user_id}) plus a sorted set of ids scored by creation
+# time (notifications_idx:{user_id}) for ordering and capping. Both keys
+# carry a retention TTL refreshed on every save, and entries older than the
+# retention window are dropped on write, so Redis handles expiry.
+
+# KEYS: payload hash, index zset.
+# ARGV: id, payload, score, max entries, retention seconds
+_SAVE_NOTIFICATION_LUA = """
+local retention = tonumber(ARGV[5])
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+local removed = 0
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', '(' .. (tonumber(ARGV[3]) - retention))
+if #expired > 0 then
+    redis.call('ZREM', KEYS[2], unpack(expired))
+    redis.call('HDEL', KEYS[1], unpack(expired))
+    removed = #expired
+end
+local overflow = redis.call('ZRANGE', KEYS[2], 0, -(tonumber(ARGV[4]) + 1))
+if #overflow > 0 then
+    redis.call('ZREM', KEYS[2], unpack(overflow))
+    redis.call('HDEL', KEYS[1], unpack(overflow))
+    removed = removed + #overflow
+end
+redis.call('EXPIRE', KEYS[1], retention)
+redis.call('EXPIRE', KEYS[2], retention)
+return removed
+"""
+
+# Payloads start with the read flag (see Notification._to_dict), so the
+# mark-read scripts flip it in place and leave the rest byte-identical
+
+# KEYS: payload hash. ARGV: id. Returns 1 if the notification exists
+_MARK_READ_LUA = """
+local payload = redis.call('HGET', KEYS[1], ARGV[1])
+if not payload then
+    return 0
+end
+if string.sub(payload, 1, 14) == '{"read":false,' then
+    redis.call('HSET', KEYS[1], ARGV[1], '{"read":true,' .. string.sub(payload, 15))
+end
+return 1
+"""
+
+# KEYS: payload hash. Returns the number of notifications flipped to read
+_MARK_ALL_READ_LUA = """
+local entries = redis.call('HGETALL', KEYS[1])
+local count = 0
+for i = 1, #entries, 2 do
+    local payload = entries[i + 1]
+    if string.sub(payload, 1, 14) == '{"read":false,' then
+        redis.call('HSET', KEYS[1], entries[i], '{"read":true,' .. string.sub(payload, 15))
+        count = count + 1
+    end
+end
+return count
+"""
+
+
+@dataclass(slots=True)
 class Notification:
     """Notification object."""
-    id: str = field(default_factory=lambda: str(uuid4()))
     user_id: UUID
-    type: str = NotificationType.SYSTEM.value
+    id: str = field(default_factory=lambda: str(uuid4()))
+    type: str = _TYPE_SYSTEM
     title: str = ""
     message: str = ""
-    priority: str = NotificationPriority.NORMAL.value
-    channels: List[str] = field(default_factory=lambda: [NotificationChannel.IN_APP.value])
+    priority: str = _PRIORITY_NORMAL
+    channels: Sequence[str] = _DEFAULT_CHANNELS
     data: Dict[str, Any] = field(default_factory=dict)
     read: bool = False
     created_at: datetime = field(default_factory=datetime.utcnow)
     expires_at: Optional[datetime] = None
     action_url: Optional[str] = None
     icon: Optional[str] = None
+    
+    def _to_dict(self) -> Dict[str, Any]:
+        """Build a plain dict from the slot attributes (no deep copy)."""
+        # "read" comes first: the mark-read scripts patch it by prefix
+        return {
+            "read": self.read,
+            "id": self.id,
+            "user_id": self.user_id,
+            "type": self.type,
+            "title": self.title,
+            "message": self.message,
+            "priority": self.priority,
+            "channels": self.channels,
+            "data": self.data,
+            "created_at": self.created_at,
+            "expires_at": self.expires_at,
+            "action_url": self.action_url,
+            "icon": self.icon,
+        }
+    
+    def _to_bytes(self) -> bytes:
+        """Serialize to JSON bytes for Redis storage and channel queues."""
+        return orjson.dumps(self._to_dict(), option=orjson.OPT_NAIVE_UTC)
+
+    @classmethod
+    def _from_bytes(cls, payload: Union[str, bytes]) -> "Notification":
+        """Deserialize a payload produced by _to_bytes."""
+        data = orjson.loads(payload)
+        data["user_id"] = UUID(data["user_id"])
+        # Timestamps are stored as UTC; keep them naive like utcnow()
+        for key in ("created_at", "expires_at"):
+            if data.get(key):
+                data[key] = datetime.fromisoformat(data[key]).replace(tzinfo=None)
+        return cls(**data)
 
 
 @dataclass
@@ -102,23 +245,43 @@ class NotificationsHandler:
         self.db_manager = db_manager
         self.cache = cache_manager
         self.digest_config = digest_config or DigestConfig()
+        self._quiet_hour_mask = self._build_quiet_hour_mask()
         self.webhook_secret = webhook_secret
+        self._max_notifications_per_user = 100
+        self._notification_retention_seconds = 30 * 86400
+        
+        # Lua scripts registered with Redis (called via EVALSHA)
+        self._lua_scripts: Dict[str, AsyncScript] = {}
         
-        # User preferences cache
-        self._preferences: Dict[UUID, Dict[str, Any]] = {}
+        # User preferences cache (bounded; volatile per-user data)
+        self._preferences: TTLCache = TTLCache(maxsize=10_000, ttl=300)
         
-        # Notification queues per user
-        self._digest_queues: Dict[UUID, List[Notification]] = {}
+        # Digest queues per user of (type, serialized notification), sharded
+        self._digest_queues: List[Dict[UUID, Deque[Tuple[str, bytes]]]] = [
+            {} for _ in range(_SHARD_COUNT)
+        ]
         
-        # DND schedules
-        self._dnd_users: Set[UUID] = set()
+        # DND end time per user (bounded, refreshed from Redis every 30s and
+        # checked on read so a DND period ends on time), sharded
+        self._dnd_cache: List[TTLCache] = [
+            TTLCache(maxsize=100_000 // _SHARD_COUNT, ttl=30) for _ in range(_SHARD_COUNT)
+        ]
+        self._dnd_mget_chunk_size = 1000
         
-        # Webhook callbacks
-        self._webhook_handlers: List[Callable] = []
+        # Webhook callbacks, split by kind at registration
+        self._async_webhook_handlers: List[Callable] = []
+        self._sync_webhook_handlers: List[Callable] = []
+        
+        # Channel -> dispatcher
+        self._dispatchers: Dict[str, Callable[[Notification], Awaitable[None]]] = {
+            _CHANNEL_IN_APP: self._dispatch_in_app,
+            _CHANNEL_EMAIL: self._dispatch_email,
+            _CHANNEL_PUSH: self._dispatch_push,
+            _CHANNEL_WEBHOOK: self._dispatch_webhook,
+        }
         
         # Background tasks
         self._digest_task: Optional[asyncio.Task] = None
-        self._cleanup_task: Optional[asyncio.Task] = None
         self._running = False
         
         logger.info("NotificationsHandler initialized")
@@ -127,11 +290,12 @@ class NotificationsHandler:
         """Start background tasks."""
         self._running = True
         
+        for source in (_SAVE_NOTIFICATION_LUA, _MARK_READ_LUA, _MARK_ALL_READ_LUA):
+            self._script(source)
+        
         if self.digest_config.enabled:
             self._digest_task = asyncio.create_task(self._digest_worker())
         
-        self._cleanup_task = asyncio.create_task(self._cleanup_worker())
-        
         logger.info("NotificationsHandler started")
     
     async def stop(self) -> None:
@@ -145,13 +309,6 @@ class NotificationsHandler:
             except asyncio.CancelledError:
                 pass
         
-        if self._cleanup_task:
-            self._cleanup_task.cancel()
-            try:
-                await self._cleanup_task
-            except asyncio.CancelledError:
-                pass
-        
         logger.info("NotificationsHandler stopped")
     
     # =========================================================================
@@ -164,8 +321,8 @@ class NotificationsHandler:
         notification_type: str,
         title: str,
         message: str,
-        priority: NotificationPriority = NotificationPriority.NORMAL,
-        channels: List[NotificationChannel] = None,
+        priority: Union[NotificationPriority, str] = NotificationPriority.NORMAL,
+        channels: Optional[Sequence[Union[NotificationChannel, str]]] = None,
         data: Dict[str, Any] = None,
         action_url: str = None,
         icon: str = None,
@@ -179,8 +336,8 @@ class NotificationsHandler:
             notification_type: Type of notification
             title: Notification title
             message: Notification message
-            priority: Priority level
-            channels: Delivery channels
+            priority: Priority level (enum or its string value)
+            channels: Delivery channels (enums or their string values)
             data: Additional data
             action_url: URL for user action
             icon: Icon identifier
@@ -189,13 +346,19 @@ class NotificationsHandler:
         Returns:
             Created notification
         """
+        if isinstance(priority, NotificationPriority):
+            priority = priority.value
+        
         notification = Notification(
             user_id=user_id,
             type=notification_type,
             title=title,
             message=message,
-            priority=priority.value,
-            channels=[c.value for c in channels] if channels else [NotificationChannel.IN_APP.value],
+            priority=priority,
+            channels=tuple(
+                c.value if isinstance(c, NotificationChannel) else c
+                for c in channels
+            ) if channels else _DEFAULT_CHANNELS,
             data=data or {},
             action_url=action_url,
             icon=icon,
@@ -204,7 +367,7 @@ class NotificationsHandler:
         
         # Check DND
         if await self._is_in_dnd(user_id):
-            if priority != NotificationPriority.URGENT:
+            if priority != _PRIORITY_URGENT:
                 # Queue for later delivery
                 await self._queue_notification(notification)
                 return notification
@@ -300,22 +463,50 @@ class NotificationsHandler:
         user_ids: List[UUID],
         title: str,
         message: str,
-        priority: NotificationPriority = NotificationPriority.NORMAL,
+        priority: Union[NotificationPriority, str] = NotificationPriority.NORMAL,
     ) -> List[Notification]:
-        """Create announcement notification for multiple users."""
-        notifications = []
+        """
+        Create announcement notification for multiple users.
+        
+        Delivered notifications are saved through one Redis pipeline.
+        """
+        # Check DND for all recipients in one round-trip
+        dnd_flags = await self._get_dnd_flags(user_ids)
+        if isinstance(priority, NotificationPriority):
+            priority = priority.value
+        bypass_dnd = priority == _PRIORITY_URGENT
         
-        for user_id in user_ids:
-            notification = await self.create_notification(
+        # One timestamp for the whole fan-out
+        now = datetime.utcnow()
+        
+        notifications = []
+        deliver = []
+        for user_id, in_dnd in zip(user_ids, dnd_flags):
+            notification = Notification(
                 user_id=user_id,
-                notification_type=NotificationType.ANNOUNCEMENT.value,
+                type=_TYPE_ANNOUNCEMENT,
                 title=title,
                 message=message,
                 priority=priority,
-                channels=[NotificationChannel.IN_APP],
+                channels=_DEFAULT_CHANNELS,
+                created_at=now,
                 icon="announcement",
             )
             notifications.append(notification)
+            
+            if in_dnd and not bypass_dnd:
+                # Queue for later delivery
+                await self._queue_notification(notification)
+            else:
+                deliver.append(notification)
+        
+        # Save all deliverable notifications in one pipeline
+        await self._save_notifications_bulk(deliver)
+        
+        for notification in deliver:
+            await self._dispatch_in_app(notification)
+        
+        logger.debug("Announcement dispatched", recipients=len(user_ids))
         
         return notifications
     
@@ -328,19 +519,26 @@ class NotificationsHandler:
         notification: Notification,
     ) -> None:
         """Dispatch notification to all channels."""
-        tasks = []
+        channels = notification.channels
         
-        for channel in notification.channels:
-            if channel == NotificationChannel.IN_APP.value:
-                tasks.append(self._dispatch_in_app(notification))
-            elif channel == NotificationChannel.EMAIL.value:
-                tasks.append(self._dispatch_email(notification))
-            elif channel == NotificationChannel.PUSH.value:
-                tasks.append(self._dispatch_push(notification))
-            elif channel == NotificationChannel.WEBHOOK.value:
-                tasks.append(self._dispatch_webhook(notification))
+        # Fast path: a single channel (usually in-app) needs no gather
+        if len(channels) == 1:
+            dispatcher = self._dispatchers.get(channels[0])
+            if dispatcher is not None:
+                try:
+                    await dispatcher(notification)
+                except Exception as e:
+                    logger.error("Notification dispatch error", channel=channels[0], error=str(e))
+            return
         
-        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(
+            *(
+                self._dispatchers[channel](notification)
+                for channel in channels
+                if channel in self._dispatchers
+            ),
+            return_exceptions=True,
+        )
     
     async def _dispatch_in_app(
         self,
@@ -363,7 +561,7 @@ class NotificationsHandler:
         # Queue to email service (RabbitMQ, Redis, etc.)
         await self.cache.redis_client.lpush(
             "email_queue",
-            notification.model_dump_json(),
+            notification._to_bytes(),
         )
         logger.debug(
             "Email notification queued",
@@ -378,7 +576,7 @@ class NotificationsHandler:
         # Queue to push notification service
         await self.cache.redis_client.lpush(
             "push_queue",
-            notification.model_dump_json(),
+            notification._to_bytes(),
         )
         logger.debug(
             "Push notification queued",
@@ -390,12 +588,18 @@ class NotificationsHandler:
         notification: Notification,
     ) -> None:
         """Send webhook notification."""
-        for handler in self._webhook_handlers:
+        if self._async_webhook_handlers:
+            results = await asyncio.gather(
+                *(handler(notification) for handler in self._async_webhook_handlers),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error("Webhook handler error", error=str(result))
+        
+        for handler in self._sync_webhook_handlers:
             try:
-                if asyncio.iscoroutinefunction(handler):
-                    await handler(notification)
-                else:
-                    handler(notification)
+                handler(notification)
             except Exception as e:
                 logger.error("Webhook handler error", error=str(e))
     
@@ -403,8 +607,11 @@ class NotificationsHandler:
         self,
         handler: Callable[[Notification], None],
     ) -> None:
-        """Add a webhook handler."""
-        self._webhook_handlers.append(handler)
+        """Add a webhook handler (sync or async)."""
+        if asyncio.iscoroutinefunction(handler):
+            self._async_webhook_handlers.append(handler)
+        else:
+            self._sync_webhook_handlers.append(handler)
     
     # =========================================================================
     # Digest Mode
@@ -414,19 +621,21 @@ class NotificationsHandler:
         self,
         notification: Notification,
     ) -> None:
-        """Queue notification for digest delivery."""
-        user_id = notification.user_id
-        
-        if user_id not in self._digest_queues:
-            self._digest_queues[user_id] = []
+        """
+        Queue notification for digest delivery.
         
-        self._digest_queues[user_id].append(notification)
+        The notification is serialized on entry, so the digest can splice
+        the payloads in without re-encoding and the object is not retained.
+        """
+        shard = self._digest_queues[notification.user_id.int & _SHARD_MASK]
+        queue = shard.get(notification.user_id)
+        if queue is None:
+            # Bounded: appending past the cap evicts the oldest entry
+            queue = shard[notification.user_id] = deque(
+                maxlen=self.digest_config.max_notifications_per_digest,
+            )
         
-        # Trim queue to max size
-        if len(self._digest_queues[user_id]) > self.digest_config.max_notifications_per_digest:
-            self._digest_queues[user_id] = self._digest_queues[user_id][
-                -self.digest_config.max_notifications_per_digest:
-            ]
+        queue.append((notification.type, notification._to_bytes()))
     
     async def _digest_worker(self) -> None:
         """Background task to send notification digests."""
@@ -439,88 +648,147 @@ class NotificationsHandler:
                     continue
                 
                 # Send digests
-                for user_id, notifications in list(self._digest_queues.items()):
-                    if notifications:
-                        await self._send_digest(user_id, notifications)
-                        self._digest_queues[user_id] = []
+                await self._flush_digests()
                         
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.exception("Digest worker error", error=str(e))
     
-    def _is_quiet_hours(self) -> bool:
-        """Check if current time is in quiet hours."""
-        if not self.digest_config.quiet_hours_start or not self.digest_config.quiet_hours_end:
-            return False
+    def _build_quiet_hour_mask(self) -> int:
+        """
+        Build a 24-bit mask with bit N set iff hour N (UTC) is a quiet hour.
         
-        current_hour = datetime.utcnow().hour
+        Must be rebuilt if the digest quiet hours are changed.
+        """
+        start = self.digest_config.quiet_hours_start
+        end = self.digest_config.quiet_hours_end
+        if start is None or end is None:
+            return 0
         
-        if self.digest_config.quiet_hours_start <= self.digest_config.quiet_hours_end:
-            return self.digest_config.quiet_hours_start <= current_hour < self.digest_config.quiet_hours_end
-        else:
-            # Quiet hours span midnight
-            return current_hour >= self.digest_config.quiet_hours_start or current_hour < self.digest_config.quiet_hours_end
+        mask = 0
+        for hour in range(24):
+            if start <= end:
+                quiet = start <= hour < end
+            else:
+                # Quiet hours span midnight
+                quiet = hour >= start or hour < end
+            if quiet:
+                mask |= 1 << hour
+        return mask
     
-    async def _send_digest(
+    def _is_quiet_hours(self, hour: Optional[int] = None) -> bool:
+        """Check if the given (default: current UTC) hour is in quiet hours."""
+        if hour is None:
+            hour = datetime.utcnow().hour
+        return bool((self._quiet_hour_mask >> hour) & 1)
+    
+    async def _flush_digests(self) -> None:
+        """Flush pending digests, all shards concurrently."""
+        await asyncio.gather(*(
+            self._flush_digest_shard(shard) for shard in self._digest_queues
+        ))
+    
+    async def _flush_digest_shard(
         self,
-        user_id: UUID,
-        notifications: List[Notification],
+        shard: Dict[UUID, Deque[Tuple[str, bytes]]],
     ) -> None:
-        """Send a notification digest to a user."""
-        if not notifications:
+        """
+        Build a shard's pending digests and save them in one pipelined flush.
+        
+        Users whose save failed get their notifications re-queued for the
+        next digest tick.
+        """
+        pending: List[Tuple[UUID, List[Tuple[str, bytes]], Notification]] = []
+        for user_id, queue in shard.items():
+            if queue:
+                # Snapshot first so arrivals during the flush are kept
+                entries = list(queue)
+                queue.clear()
+                pending.append((user_id, entries, self._build_digest(user_id, entries)))
+        
+        if not pending:
             return
         
-        # Group notifications by type
-        grouped = {}
-        for n in notifications:
-            if n.type not in grouped:
-                grouped[n.type] = []
-            grouped[n.type].append(n)
+        # Pipeline command range of each digest's save
+        spans: List[Tuple[int, int]] = []
+        try:
+            async with self.cache.redis_client.pipeline(transaction=False) as pipe:
+                for _, _, digest in pending:
+                    start = len(pipe)
+                    await self._queue_save(pipe, digest)
+                    spans.append((start, len(pipe)))
+                
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            logger.error("Digest flush failed", users=len(pending), error=str(e))
+            for user_id, entries, _ in pending:
+                self._requeue_digest(user_id, entries)
+            return
+        
+        failed = 0
+        for (user_id, entries, digest), (start, end) in zip(pending, spans):
+            if any(isinstance(result, Exception) for result in results[start:end]):
+                self._requeue_digest(user_id, entries)
+                failed += 1
+            else:
+                await self._dispatch_in_app(digest)
+        
+        if failed:
+            logger.warning("Digest saves failed", failed=failed, users=len(pending))
+    
+    def _requeue_digest(
+        self,
+        user_id: UUID,
+        entries: List[Tuple[str, bytes]],
+    ) -> None:
+        """Put unsent digest entries back ahead of newer arrivals."""
+        shard = self._digest_queues[user_id.int & _SHARD_MASK]
+        queue = shard.get(user_id)
+        # Rebuilding keeps the newest entries when the cap is exceeded
+        shard[user_id] = deque(
+            (*entries, *(queue or ())),
+            maxlen=self.digest_config.max_notifications_per_digest,
+        )
+    
+    def _build_digest(
+        self,
+        user_id: UUID,
+        entries: List[Tuple[str, bytes]],
+    ) -> Notification:
+        """Build the digest notification summarizing a user's queue."""
+        # Count notifications by type
+        grouped: Dict[str, int] = Counter(type_ for type_, _ in entries)
         
         # Create digest notification
         summary = self._generate_digest_summary(grouped)
         
-        digest_notification = Notification(
+        return Notification(
             user_id=user_id,
             type="digest",
             title="Notification Digest",
             message=summary,
-            priority=NotificationPriority.LOW,
-            channels=[NotificationChannel.IN_APP.value],
+            priority=_PRIORITY_LOW,
+            channels=_DEFAULT_CHANNELS,
             data={
-                "notifications": [n.model_dump() for n in notifications],
-                "grouped": {
-                    k: len(v) for k, v in grouped.items()
-                },
+                # Queued payloads are spliced in verbatim on serialization
+                "notifications": [orjson.Fragment(payload) for _, payload in entries],
+                "grouped": dict(grouped),
             },
         )
-        
-        await self._save_notification(digest_notification)
-        await self._dispatch_in_app(digest_notification)
     
     def _generate_digest_summary(
         self,
-        grouped: Dict[str, List[Notification]],
+        grouped: Dict[str, int],
     ) -> str:
-        """Generate a summary string for the digest."""
-        lines = ["You have new notifications:"]
-        
-        type_labels = {
-            NotificationType.FIRST_BLOOD.value: "First Bloods",
-            NotificationType.CHALLENGE_UNLOCK.value: "Unlocked Challenges",
-            NotificationType.CHALLENGE_SOLVE.value: "Challenge Solves",
-            NotificationType.TEAM_INVITE.value: "Team Invites",
-            NotificationType.ANNOUNCEMENT.value: "Announcements",
-            NotificationType.SYSTEM.value: "System Messages",
-        }
-        
-        for type_, notifications in grouped.items():
-            label = type_labels.get(type_, type_)
-            count = len(notifications)
-            lines.append(f"• {count} {label}")
-        
-        return "\n".join(lines)
+        """Generate a summary string from per-type notification counts."""
+        return "\n".join((
+            "You have new notifications:",
+            *(
+                f"• {count} {_DIGEST_TYPE_LABELS.get(type_, type_)}"
+                for type_, count in grouped.items()
+            ),
+        ))
     
     # =========================================================================
     # DND Management
@@ -533,33 +801,66 @@ class NotificationsHandler:
         expires_at: datetime = None,
     ) -> None:
         """Set Do Not Disturb for a user."""
+        key = f"dnd:{user_id}"
+        
         if enabled:
-            self._dnd_users.add(user_id)
-            # Cache expiration
+            expire_at = None
+            value = _DND_INDEFINITE
             if expires_at:
-                await self.cache.redis_client.setex(
-                    f"dnd:{user_id}",
-                    int((expires_at - datetime.utcnow()).total_seconds()),
-                    "1",
-                )
+                # Naive timestamps are UTC (see utcnow() usage throughout)
+                if expires_at.tzinfo is None:
+                    expires_at = expires_at.replace(tzinfo=timezone.utc)
+                expire_at = int(expires_at.timestamp())
+                value = str(expire_at)
+            # Redis expires the key at the absolute time itself
+            await self.cache.redis_client.set(key, value, exat=expire_at)
         else:
-            self._dnd_users.discard(user_id)
-            await self.cache.redis_client.delete(f"dnd:{user_id}")
+            value = None
+            await self.cache.redis_client.delete(key)
+        
+        # Write through so the local cache is never stale for this process
+        self._dnd_cache[user_id.int & _SHARD_MASK][user_id] = _dnd_until(value)
         
         logger.info("DND updated", user_id=str(user_id), enabled=enabled)
     
     async def _is_in_dnd(self, user_id: UUID) -> bool:
         """Check if user is in DND mode."""
-        if user_id in self._dnd_users:
-            return True
+        cache = self._dnd_cache[user_id.int & _SHARD_MASK]
+        until = cache.get(user_id)
+        if until is None:
+            # Check Redis
+            until = cache[user_id] = _dnd_until(
+                await self.cache.redis_client.get(f"dnd:{user_id}")
+            )
         
-        # Check Redis
-        in_dnd = await self.cache.redis_client.get(f"dnd:{user_id}")
-        if in_dnd == "1":
-            self._dnd_users.add(user_id)
-            return True
+        return until > time.time()
+    
+    async def _get_dnd_flags(self, user_ids: List[UUID]) -> List[bool]:
+        """Check DND mode for many users, fetching cache misses with one MGET."""
+        dnd_cache = self._dnd_cache
+        ends = [dnd_cache[user_id.int & _SHARD_MASK].get(user_id) for user_id in user_ids]
+        misses = [user_id for user_id, until in zip(user_ids, ends) if until is None]
         
-        return False
+        if misses:
+            # One round-trip, split into bounded MGETs so a large
+            # announcement does not block Redis on a single huge command
+            chunk_size = self._dnd_mget_chunk_size
+            async with self.cache.redis_client.pipeline(transaction=False) as pipe:
+                for i in range(0, len(misses), chunk_size):
+                    pipe.mget([f"dnd:{user_id}" for user_id in misses[i:i + chunk_size]])
+                chunks = await pipe.execute()
+            values = [value for chunk in chunks for value in chunk]
+            
+            fetched = {}
+            for user_id, value in zip(misses, values):
+                fetched[user_id] = dnd_cache[user_id.int & _SHARD_MASK][user_id] = _dnd_until(value)
+            ends = [
+                fetched[user_id] if until is None else until
+                for user_id, until in zip(user_ids, ends)
+            ]
+        
+        now = time.time()
+        return [until > now for until in ends]
     
     # =========================================================================
     # User Preferences
@@ -570,8 +871,9 @@ class NotificationsHandler:
         user_id: UUID,
     ) -> Dict[str, Any]:
         """Get user notification preferences."""
-        if user_id in self._preferences:
-            return self._preferences[user_id]
+        prefs = self._preferences.get(user_id)
+        if prefs is not None:
+            return prefs
         
         # Load from database/cache
         prefs = await self.cache.redis_client.hgetall(
@@ -600,15 +902,20 @@ class NotificationsHandler:
         preferences: Dict[str, Any],
     ) -> None:
         """Update user notification preferences."""
-        self._preferences[user_id] = {
-            **await self.get_user_preferences(user_id),
-            **preferences,
-        }
+        current = self._preferences.get(user_id)
+        if current is None:
+            current = await self.get_user_preferences(user_id)
+        
+        merged = {**current, **preferences}
+        self._preferences[user_id] = merged
         
-        # Persist to Redis
+        # Persist to Redis in a single HSET with pre-encoded string values
         await self.cache.redis_client.hset(
             f"notification_prefs:{user_id}",
-            self._preferences[user_id],
+            mapping={
+                key: "1" if value is True else "0" if value is False else str(value)
+                for key, value in merged.items()
+            },
         )
         
         logger.info("Preferences updated", user_id=str(user_id))
@@ -617,23 +924,78 @@ class NotificationsHandler:
     # Database Operations
     # =========================================================================
     
+    def _script(self, source: str) -> AsyncScript:
+        """Get the registered script for a Lua source, registering on first use."""
+        script = self._lua_scripts.get(source)
+        if script is None:
+            script = self.cache.redis_client.register_script(source)
+            self._lua_scripts[source] = script
+        return script
+    
+    def _save_script_args(
+        self,
+        notification: Notification,
+        payload: bytes,
+    ) -> Dict[str, List[Any]]:
+        """Build the save script keys/args for a notification."""
+        user_id = notification.user_id
+        score = notification.created_at.replace(tzinfo=timezone.utc).timestamp()
+        return {
+            "keys": [f"notifications:{user_id}", f"notifications_idx:{user_id}"],
+            "args": [
+                notification.id,
+                payload,
+                score,
+                self._max_notifications_per_user,
+                self._notification_retention_seconds,
+            ],
+        }
+    
     async def _save_notification(
         self,
         notification: Notification,
     ) -> None:
         """Save notification to database."""
-        # Insert into notifications table
-        await self.cache.redis_client.lpush(
-            f"notifications:{notification.user_id}",
-            notification.model_dump_json(),
+        # Store payload, index it, cap/expire old entries in one round-trip
+        await self._script(_SAVE_NOTIFICATION_LUA)(
+            **self._save_script_args(notification, notification._to_bytes()),
         )
+    
+    async def _queue_save(
+        self,
+        pipe: Any,
+        notification: Notification,
+    ) -> None:
+        """
+        Queue a notification's save on a pipeline.
         
-        # Trim to last 100 notifications
-        await self.cache.redis_client.ltrim(
-            f"notifications:{notification.user_id}",
-            0,
-            99,
+        The payload is serialized once and shared by the save script and
+        the email and push channel queue pushes.
+        """
+        payload = notification._to_bytes()
+        await self._script(_SAVE_NOTIFICATION_LUA)(
+            **self._save_script_args(notification, payload),
+            client=pipe,
         )
+        
+        if _CHANNEL_EMAIL in notification.channels:
+            pipe.lpush("email_queue", payload)
+        if _CHANNEL_PUSH in notification.channels:
+            pipe.lpush("push_queue", payload)
+    
+    async def _save_notifications_bulk(
+        self,
+        notifications: List[Notification],
+    ) -> None:
+        """Save many notifications in a single Redis round-trip."""
+        if not notifications:
+            return
+        
+        async with self.cache.redis_client.pipeline(transaction=False) as pipe:
+            for notification in notifications:
+                await self._queue_save(pipe, notification)
+            
+            await pipe.execute()
     
     async def get_user_notifications(
         self,
@@ -641,13 +1003,22 @@ class NotificationsHandler:
         limit: int = 50,
         unread_only: bool = False,
     ) -> List[Notification]:
-        """Get notifications for a user."""
-        key = f"notifications:{user_id}"
-        notifications = await self.cache.redis_client.lrange(key, 0, limit - 1)
+        """Get notifications for a user, newest first."""
+        notification_ids = await self.cache.redis_client.zrevrange(
+            f"notifications_idx:{user_id}", 0, limit - 1,
+        )
+        if not notification_ids:
+            return []
+        
+        payloads = await self.cache.redis_client.hmget(
+            f"notifications:{user_id}", notification_ids,
+        )
         
         result = []
-        for n in notifications:
-            notification = Notification(**n)
+        for payload in payloads:
+            if payload is None:
+                continue
+            notification = Notification._from_bytes(payload)
             if not unread_only or not notification.read:
                 result.append(notification)
         
@@ -659,62 +1030,37 @@ class NotificationsHandler:
         notification_id: str,
     ) -> bool:
         """Mark a notification as read."""
-        key = f"notifications:{user_id}"
-        notifications = await self.cache.redis_client.lrange(key, 0, -1)
-        
-        for i, n in enumerate(notifications):
-            if n.get("id") == notification_id:
-                n["read"] = True
-                await self.cache.redis_client.lset(key, i, n)
-                return True
-        
-        return False
+        found = await self._script(_MARK_READ_LUA)(
+            keys=[f"notifications:{user_id}"],
+            args=[notification_id],
+        )
+        return bool(found)
     
     async def mark_all_read(
         self,
         user_id: UUID,
     ) -> int:
         """Mark all notifications as read."""
-        key = f"notifications:{user_id}"
-        notifications = await self.cache.redis_client.lrange(key, 0, -1)
-        
-        count = 0
-        for i, n in enumerate(notifications):
-            if not n.get("read", False):
-                n["read"] = True
-                await self.cache.redis_client.lset(key, i, n)
-                count += 1
-        
-        return count
+        return await self._script(_MARK_ALL_READ_LUA)(
+            keys=[f"notifications:{user_id}"],
+        )
     
     # =========================================================================
-    # Cleanup Worker
+    # Statistics
     # =========================================================================
     
-    async def _cleanup_worker(self) -> None:
-        """Background task to clean up expired notifications."""
-        while self._running:
-            try:
-                await asyncio.sleep(3600)  # Run every hour
-                
-                # Clean up old notifications from database
-                cutoff = datetime.utcnow() - timedelta(days=30)
-                
-                # This would be a database cleanup operation
-                logger.debug("Notification cleanup completed")
-                
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.exception("Cleanup worker error", error=str(e))
-    
     def get_stats(self) -> Dict[str, Any]:
         """Get handler statistics."""
+        now = time.time()
         return {
             "running": self._running,
             "digest_enabled": self.digest_config.enabled,
             "digest_interval_minutes": self.digest_config.interval_minutes,
-            "dnd_users_count": len(self._dnd_users),
-            "pending_digest_notifications": sum(len(q) for q in self._digest_queues.values()),
-            "webhook_handlers_count": len(self._webhook_handlers),
+            "dnd_users_count": sum(
+                1 for cache in self._dnd_cache for until in cache.values() if until > now
+            ),
+            "pending_digest_notifications": sum(
+                len(q) for shard in self._digest_queues for q in shard.values()
+            ),
+            "webhook_handlers_count": len(self._async_webhook_handlers) + len(self._sync_webhook_handlers),
         }
@@ -8,35 +8,92 @@ Provides JWT validation and authorization for WebSocket connections:
 - CSRF protection for HTTP polling fallback
 """
 
+import base64
 import hashlib
 import hmac
+import math
+import secrets
 import time
-from datetime import datetime, timedelta
-from typing import Any, Callable, Dict, Optional, Tuple
-from uuid import UUID
+from collections import deque
+from dataclasses import dataclass, fields
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+from uuid import uuid4
 
+import orjson
 import structlog
+from cachetools import TTLCache
 from fastapi import HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.websockets import WebSocketState
 from jose import JWTError, jwt
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
 
 from app.core.config import Settings, get_settings
+from app.infrastructure.orchestrator.realtime.clock import utc_isoformat
 
 logger = structlog.get_logger(__name__)
 
 
-class TokenPayload(BaseModel):
-    """JWT token payload structure."""
+# Required fields (and their types; object = any) per inbound message type
+_MESSAGE_SCHEMAS: Dict[str, Dict[str, type]] = {
+    "subscribe": {"channels": list},
+    "unsubscribe": {"channels": list},
+    "challenge_attempt": {"challenge_id": object},
+}
+
+
+# Shared token bucket, refilled and spent atomically.
+# KEYS: bucket hash. ARGV: capacity, refill rate (tokens/s), now (s), ttl (s)
+# Returns {allowed (0/1), retry_after_seconds}
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+-- Redis clock, so every worker refills against the same time source
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return {allowed, retry_after}
+"""
+
+
+@dataclass(slots=True, frozen=True)
+class TokenPayload:
+    """JWT token payload structure (claims are already parsed by jwt.decode)."""
     sub: str  # User ID
     username: str
-    role: str = "player"
-    team_id: Optional[str] = None
     exp: int
     iat: int
+    role: str = "player"
+    team_id: Optional[str] = None
     type: str = "access"
 
 
+# Claims copied into TokenPayload; anything else in the token is ignored
+_TOKEN_PAYLOAD_FIELDS = tuple(f.name for f in fields(TokenPayload))
+
+# Claims a valid access token must carry
+_REQUIRED_CLAIMS = ("sub", "username", "exp", "iat")
+
+# Expiry is checked against time.time() after decoding (see _accept_claims),
+# which skips jose's datetime-based exp validation
+_JWT_DECODE_OPTIONS = {"verify_exp": False}
+
+
 class WSConnectionState(BaseModel):
     """WebSocket connection state."""
     connection_id: str
@@ -46,7 +103,7 @@ class WSConnectionState(BaseModel):
     role: str = "player"
     connected_at: str
     last_activity: str
-    subscribed_rooms: list = []
+    subscribed_rooms: set = set()
     is_authenticated: bool = False
     is_anonymous: bool = True
 
@@ -68,22 +125,65 @@ class WSAuthMiddleware:
         settings: Optional[Settings] = None,
         secret_key: Optional[str] = None,
         algorithm: str = "HS256",
+        redis: Optional[Redis] = None,
     ):
         self.settings = settings or get_settings()
         self.secret_key = secret_key or self.settings.secret_key
         self.algorithm = algorithm
         
+        # Secret encoded once for JWT and HMAC use
+        self._secret_key_bytes = self.secret_key.encode("utf-8")
+        
+        # Keyed HMAC state for message signing, copied per message
+        self._hmac_template = hmac.new(self._secret_key_bytes, digestmod=hashlib.sha256)
+        
         # Token expiry
         self.access_token_expire_minutes = self.settings.access_token_expire_minutes or 30
+        self._token_exp_seconds = self.access_token_expire_minutes * 60
+        
+        # Verified token claims keyed by token digest (successes only)
+        self._verify_cache: TTLCache = TTLCache(maxsize=10_000, ttl=30)
         
         # Rate limiting
-        self._rate_limits: Dict[str, Dict[str, Any]] = {}
         self.rate_limit_window = 60  # seconds
         self.rate_limit_max = 100  # messages per window
+        self.rate_limit_burst = self.rate_limit_max  # bucket capacity
+        
+        # Token bucket of [tokens, last_refill] per key; idle buckets are
+        # full again after one window, so they can simply expire
+        self._rate_limits: TTLCache = TTLCache(maxsize=100_000, ttl=self.rate_limit_window * 2)
         
-        # CSRF tokens
-        self._csrf_tokens: Dict[str, datetime] = {}
+        # Sliding-window log per key (strict variant, see check_sliding_window_rate_limit)
+        self._rate_limit_logs: TTLCache = TTLCache(maxsize=100_000, ttl=self.rate_limit_window)
+        
+        # Shared rate limiting across workers (see check_shared_rate_limit)
+        self.redis = redis
+        self._token_bucket_script: Optional[AsyncScript] = (
+            redis.register_script(_TOKEN_BUCKET_LUA) if redis is not None else None
+        )
+        # Recent local denials absorb bursts without a round-trip
+        self.rate_limit_denial_cache_seconds = 0.1
+        self._rate_limit_denials: TTLCache = TTLCache(
+            maxsize=100_000, ttl=self.rate_limit_denial_cache_seconds,
+        )
+        
+        # CSRF tokens (token -> connection ID), expired by the cache
         self.csrf_token_expiry = 3600  # 1 hour
+        self._csrf_tokens: TTLCache = TTLCache(maxsize=50_000, ttl=self.csrf_token_expiry)
+        
+        # Allowed Origin values (from the CORS settings; "*" allows any)
+        self._allowed_origins = frozenset(self.settings.cors_origins or ())
+        self._allow_any_origin = "*" in self._allowed_origins
+        
+        # Room authorization rules, keyed by exact room or "prefix:"
+        self._room_rules: Dict[str, Callable[[WSConnectionState, str], Tuple[bool, str]]] = {
+            "global": self._allow_room,
+            "admin": self._can_join_admin_room,
+            "team:": self._can_join_team_room,
+            "user:": self._can_join_user_room,
+            "challenge:": self._allow_room,
+            "ad:": self._allow_room,
+        }
         
         logger.info("WSAuthMiddleware initialized")
     
@@ -112,56 +212,105 @@ class WSAuthMiddleware:
         Returns:
             JWT token string
         """
+        now = time.time()
         if expires_delta:
-            expire = datetime.utcnow() + expires_delta
+            expire = now + expires_delta.total_seconds()
         else:
-            expire = datetime.utcnow() + timedelta(minutes=self.access_token_expire_minutes)
+            expire = now + self._token_exp_seconds
         
         to_encode = {
             "sub": user_id,
             "username": username,
             "role": role,
             "team_id": team_id,
-            "exp": int(expire.timestamp()),
-            "iat": int(datetime.utcnow().timestamp()),
+            "exp": int(expire),
+            "iat": int(now),
             "type": "access",
         }
         
-        encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
+        encoded_jwt = jwt.encode(to_encode, self._secret_key_bytes, algorithm=self.algorithm)
         return encoded_jwt
     
-    def verify_token(self, token: str) -> Tuple[bool, Optional[TokenPayload], str]:
+    def _verify_raw(self, token: str) -> Tuple[Optional[Dict[str, Any]], str]:
         """
-        Verify a JWT token.
+        Verify a JWT token and return its raw claims.
+        
+        Successful verifications are cached briefly so reconnect storms do
+        not re-run signature checks; expiry is still enforced on every hit.
+        The returned dict is shared with the cache and must not be mutated.
         
         Returns:
-            Tuple of (is_valid, payload, error_message)
+            Tuple of (claims or None if invalid, error_message)
         """
+        cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        cached = self._verify_cache.get(cache_key)
+        if cached is not None:
+            return self._check_cached_claims(cache_key, cached)
+        
         try:
-            payload = jwt.decode(
+            claims = jwt.decode(
                 token,
-                self.secret_key,
+                self._secret_key_bytes,
                 algorithms=[self.algorithm],
+                options=_JWT_DECODE_OPTIONS,
             )
-            
-            # Validate token type
-            if payload.get("type") != "access":
-                return False, None, "Invalid token type"
-            
-            # Create TokenPayload
-            token_payload = TokenPayload(**payload)
-            
-            # Check expiration
-            if token_payload.exp < int(datetime.utcnow().timestamp()):
-                return False, None, "Token expired"
-            
-            return True, token_payload, ""
-            
         except JWTError as e:
             logger.debug("Token verification failed", error=str(e))
-            return False, None, f"Invalid token: {str(e)}"
-        except ValidationError as e:
-            return False, None, "Invalid token payload"
+            return None, f"Invalid token: {str(e)}"
+        
+        return self._accept_claims(cache_key, claims)
+    
+    def _check_cached_claims(
+        self,
+        cache_key: bytes,
+        claims: Dict[str, Any],
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Re-check expiry of cached claims."""
+        if claims["exp"] < time.time():
+            self._verify_cache.pop(cache_key, None)
+            return None, "Token expired"
+        return claims, ""
+    
+    def _accept_claims(
+        self,
+        cache_key: bytes,
+        claims: Dict[str, Any],
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Validate freshly decoded claims and cache them if valid."""
+        # Validate token type
+        if claims.get("type") != "access":
+            return None, "Invalid token type"
+        
+        # Validate required claims
+        if not all(name in claims for name in _REQUIRED_CLAIMS):
+            return None, "Invalid token payload"
+        
+        # Check expiration
+        if claims["exp"] < time.time():
+            return None, "Token expired"
+        
+        self._verify_cache[cache_key] = claims
+        return claims, ""
+    
+    def verify_token(self, token: str) -> Tuple[bool, Optional[TokenPayload], str]:
+        """
+        Verify a JWT token.
+        
+        Returns:
+            Tuple of (is_valid, payload, error_message)
+        """
+        claims, error = self._verify_raw(token)
+        if claims is None:
+            return False, None, error
+        
+        return True, self._token_payload(claims), ""
+    
+    @staticmethod
+    def _token_payload(claims: Dict[str, Any]) -> TokenPayload:
+        """Build a TokenPayload from verified claims."""
+        return TokenPayload(**{
+            name: claims[name] for name in _TOKEN_PAYLOAD_FIELDS if name in claims
+        })
     
     # =========================================================================
     # WebSocket Authentication
@@ -185,8 +334,8 @@ class WSAuthMiddleware:
         Raises:
             WebSocketDisconnect: If authentication fails
         """
-        connection_id = str(UUID())
-        connected_at = datetime.utcnow().isoformat()
+        connection_id = uuid4().hex
+        connected_at = utc_isoformat()
         
         state = WSConnectionState(
             connection_id=connection_id,
@@ -199,27 +348,27 @@ class WSAuthMiddleware:
             state.is_anonymous = True
             return state
         
-        # Verify token
-        is_valid, payload, error = self.verify_token(token)
+        # Verify token (raw claims; no TokenPayload needed here)
+        claims, error = self._verify_raw(token)
         
-        if not is_valid:
+        if claims is None:
             logger.warning("WebSocket authentication failed", error=error)
             state.is_anonymous = True
             return state
         
         # Update state with user info
-        state.user_id = payload.sub
-        state.username = payload.username
-        state.role = payload.role
-        state.team_id = payload.team_id
+        state.user_id = claims["sub"]
+        state.username = claims["username"]
+        state.role = claims.get("role", "player")
+        state.team_id = claims.get("team_id")
         state.is_authenticated = True
         state.is_anonymous = False
         
         logger.info(
             "WebSocket authenticated",
             connection_id=connection_id,
-            user_id=payload.sub,
-            username=payload.username,
+            user_id=state.user_id,
+            username=state.username,
         )
         
         return state
@@ -243,50 +392,48 @@ class WSAuthMiddleware:
         - admin: Only admins
         - user:{user_id}: Only the user themselves
         """
-        # Global room is always accessible
-        if room_id == "global":
-            return True, ""
-        
-        # Admin room requires admin role
-        if room_id == "admin":
-            if state.role not in ["admin", "superadmin"]:
-                return False, "Admin access required"
-            return True, ""
-        
-        # Team room: verify team membership
-        if room_id.startswith("team:"):
-            required_team_id = room_id.split(":")[1]
-            
-            if state.is_anonymous:
-                return False, "Authentication required"
-            
-            if state.team_id != required_team_id:
-                return False, "Not a member of this team"
-            
-            return True, ""
+        prefix, sep, rest = room_id.partition(":")
+        rule = self._room_rules.get(prefix + sep)
         
-        # User room: verify own user ID
-        if room_id.startswith("user:"):
-            required_user_id = room_id.split(":")[1]
-            
-            if state.is_anonymous:
-                return False, "Authentication required"
-            
-            if state.user_id != required_user_id:
-                return False, "Cannot access other user's room"
-            
-            return True, ""
+        # Default: deny
+        if rule is None:
+            return False, "Unknown room type"
+        
+        return rule(state, rest)
+    
+    @staticmethod
+    def _allow_room(state: WSConnectionState, rest: str) -> Tuple[bool, str]:
+        """Public rooms (global, challenge, AD game) are always accessible."""
+        return True, ""
+    
+    @staticmethod
+    def _can_join_admin_room(state: WSConnectionState, rest: str) -> Tuple[bool, str]:
+        """Admin room requires admin role."""
+        if state.role not in ("admin", "superadmin"):
+            return False, "Admin access required"
+        return True, ""
+    
+    @staticmethod
+    def _can_join_team_room(state: WSConnectionState, rest: str) -> Tuple[bool, str]:
+        """Team room: verify team membership."""
+        if state.is_anonymous:
+            return False, "Authentication required"
+        
+        if state.team_id != rest.partition(":")[0]:
+            return False, "Not a member of this team"
         
-        # Challenge rooms are public
-        if room_id.startswith("challenge:"):
-            return True, ""
+        return True, ""
+    
+    @staticmethod
+    def _can_join_user_room(state: WSConnectionState, rest: str) -> Tuple[bool, str]:
+        """User room: verify own user ID."""
+        if state.is_anonymous:
+            return False, "Authentication required"
         
-        # AD game rooms
-        if room_id.startswith("ad:"):
-            return True, ""
+        if state.user_id != rest.partition(":")[0]:
+            return False, "Cannot access other user's room"
         
-        # Default: deny
-        return False, "Unknown room type"
+        return True, ""
     
     def validate_room_access(
         self,
@@ -306,6 +453,26 @@ class WSAuthMiddleware:
         
         return can_join
     
+    def validate_room_access_bulk(
+        self,
+        state: WSConnectionState,
+        room_ids: Iterable[str],
+    ) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """
+        Validate access to several rooms at once.
+        
+        Returns:
+            Tuple of (allowed rooms, denied rooms), each without duplicates
+        """
+        allowed = []
+        denied = []
+        for room_id in dict.fromkeys(room_ids):
+            if self.validate_room_access(state, room_id):
+                allowed.append(room_id)
+            else:
+                denied.append(room_id)
+        return tuple(allowed), tuple(denied)
+    
     # =========================================================================
     # Input Validation
     # =========================================================================
@@ -326,44 +493,44 @@ class WSAuthMiddleware:
             Tuple of (is_valid, error_message)
         """
         # Check required fields
-        if "type" not in message:
+        message_type = message.get("type")
+        if message_type is None:
             return False, "Missing 'type' field"
         
         # Validate type
-        if message["type"] != expected_type:
-            return False, f"Invalid message type: {message['type']}"
+        if message_type != expected_type:
+            return False, f"Invalid message type: {message_type}"
         
         # Type-specific validation
-        if message["type"] == "subscribe":
-            if "channels" not in message:
-                return False, "Missing 'channels' field"
-            if not isinstance(message["channels"], list):
-                return False, "'channels' must be a list"
-        
-        elif message["type"] == "unsubscribe":
-            if "channels" not in message:
-                return False, "Missing 'channels' field"
-            if not isinstance(message["channels"], list):
-                return False, "'channels' must be a list"
-        
-        elif message["type"] == "challenge_attempt":
-            if "challenge_id" not in message:
-                return False, "Missing 'challenge_id' field"
+        for field_name, field_type in _MESSAGE_SCHEMAS.get(message_type, {}).items():
+            if field_name not in message:
+                return False, f"Missing '{field_name}' field"
+            if field_type is not object and not isinstance(message[field_name], field_type):
+                return False, f"'{field_name}' must be a {field_type.__name__}"
         
         return True, ""
     
     def validate_payload_size(
         self,
-        payload: str,
+        payload: Union[str, bytes],
         max_size: int = 65536,  # 64KB
     ) -> Tuple[bool, str]:
         """
         Validate payload size.
         
+        The UTF-8 size of text is between 1 and 4 bytes per character, so
+        it is only encoded when the character count cannot decide.
+        
         Returns:
             Tuple of (is_valid, error_message)
         """
-        if len(payload.encode('utf-8')) > max_size:
+        size = len(payload)
+        if size > max_size or (
+            size * 4 > max_size
+            and isinstance(payload, str)
+            and not payload.isascii()
+            and len(payload.encode('utf-8')) > max_size
+        ):
             return False, f"Payload exceeds maximum size of {max_size} bytes"
         return True, ""
     
@@ -379,33 +546,110 @@ class WSAuthMiddleware:
         """
         Check rate limit for a connection.
         
+        Token bucket: refills at rate_limit_max per rate_limit_window up to
+        rate_limit_burst tokens, so there is no double burst at window edges.
+        
         Returns:
             Tuple of (is_allowed, retry_after_seconds)
         """
         key = f"{connection_id}:{event_type}"
         now = time.time()
-        window_start = now - self.rate_limit_window
+        rate = self.rate_limit_max / self.rate_limit_window
+        
+        bucket = self._rate_limits.get(key)
+        if bucket is None:
+            bucket = [float(self.rate_limit_burst), now]
+        # Re-store on every check so an active bucket does not expire
+        self._rate_limits[key] = bucket
+        
+        # Refill for the time elapsed since the last check
+        tokens = min(self.rate_limit_burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        
+        if tokens < 1:
+            bucket[0] = tokens
+            return False, max(1, math.ceil((1 - tokens) / rate))
+        
+        bucket[0] = tokens - 1
+        return True, 0
+    
+    async def check_shared_rate_limit(
+        self,
+        user_id: str,
+        event_type: str,
+    ) -> Tuple[bool, int]:
+        """
+        Check rate limit against a token bucket shared by all workers.
+        
+        Same semantics as check_rate_limit, but the bucket lives in Redis
+        (rl:{user_id}:{event_type}) and is updated atomically by a Lua
+        script, so one user's connections share a limit across processes
+        instead of each getting its own. Denials are remembered
+        locally for a short time so floods are rejected without a round-trip.
+        Falls back to the in-process bucket without Redis or on Redis errors.
+        
+        Returns:
+            Tuple of (is_allowed, retry_after_seconds)
+        """
+        if self._token_bucket_script is None:
+            return self.check_rate_limit(user_id, event_type)
+        
+        key = f"{user_id}:{event_type}"
+        if key in self._rate_limit_denials:
+            return False, 1
+        
+        try:
+            allowed, retry_after = await self._token_bucket_script(
+                keys=[f"rl:{key}"],
+                args=[
+                    self.rate_limit_burst,
+                    self.rate_limit_max / self.rate_limit_window,
+                    self.rate_limit_window * 2,
+                ],
+            )
+        except Exception as e:
+            logger.warning("Shared rate limit unavailable", error=str(e))
+            return self.check_rate_limit(user_id, event_type)
+        
+        if not allowed:
+            self._rate_limit_denials[key] = True
+            return False, max(1, int(retry_after))
+        
+        return True, 0
+    
+    def check_sliding_window_rate_limit(
+        self,
+        connection_id: str,
+        event_type: str,
+    ) -> Tuple[bool, int]:
+        """
+        Check rate limit using a sliding-window log.
         
-        if key not in self._rate_limits:
-            self._rate_limits[key] = {
-                "count": 0,
-                "window_start": now,
-            }
+        Stricter than check_rate_limit (never more than rate_limit_max events
+        in any rate_limit_window), at the cost of one timestamp per event;
+        meant for low-volume paths such as admin actions.
         
-        rate_data = self._rate_limits[key]
+        Returns:
+            Tuple of (is_allowed, retry_after_seconds)
+        """
+        key = f"{connection_id}:{event_type}"
+        now = time.time()
+        
+        log = self._rate_limit_logs.get(key)
+        if log is None:
+            log = deque()
+        # Re-store on every check so an active log does not expire
+        self._rate_limit_logs[key] = log
         
-        # Reset window if expired
-        if rate_data["window_start"] < window_start:
-            rate_data["count"] = 0
-            rate_data["window_start"] = now
+        # Drop events that have left the window
+        cutoff = now - self.rate_limit_window
+        while log and log[0] <= cutoff:
+            log.popleft()
         
-        # Check limit
-        if rate_data["count"] >= self.rate_limit_max:
-            # Calculate retry after
-            retry_after = int(rate_data["window_start"] + self.rate_limit_window - now)
-            return False, max(1, retry_after)
+        if len(log) >= self.rate_limit_max:
+            return False, max(1, math.ceil(log[0] - cutoff))
         
-        rate_data["count"] += 1
+        log.append(now)
         return True, 0
     
     # =========================================================================
@@ -414,11 +658,9 @@ class WSAuthMiddleware:
     
     def generate_csrf_token(self, connection_id: str) -> str:
         """Generate and store a CSRF token for a connection."""
-        token = hashlib.sha256(
-            f"{connection_id}:{time.time()}".encode()
-        ).hexdigest()
+        token = secrets.token_urlsafe(32)
         
-        self._csrf_tokens[token] = datetime.utcnow() + timedelta(seconds=self.csrf_token_expiry)
+        self._csrf_tokens[token] = connection_id
         return token
     
     def validate_csrf_token(
@@ -426,37 +668,47 @@ class WSAuthMiddleware:
         token: str,
         connection_id: str,
     ) -> bool:
-        """Validate a CSRF token."""
-        if token not in self._csrf_tokens:
-            return False
-        
-        if self._csrf_tokens[token] < datetime.utcnow():
-            del self._csrf_tokens[token]
-            return False
-        
-        # Verify token belongs to this connection
-        # (In production, you'd store the connection_id with the token)
-        return True
+        """Validate a CSRF token (expired tokens are evicted by the cache)."""
+        # Verify token exists and belongs to this connection
+        return self._csrf_tokens.get(token) == connection_id
     
     def validate_origin(self, origin: Optional[str]) -> bool:
-        """
-        Validate the Origin header for CSRF protection.
-        
-        In production, this should check against allowed origins.
-        """
-        if not origin:
+        """Validate the Origin header against the configured CORS origins."""
+        if not origin or self._allow_any_origin:
             # Allow if no origin header (same-origin requests)
             return True
         
-        # In production, validate against configured origins
-        # For now, just log
-        logger.debug("Origin validation", origin=origin)
-        return True
+        if origin in self._allowed_origins:
+            return True
+        
+        logger.debug("Origin rejected", origin=origin)
+        return False
     
     # =========================================================================
     # Message Signing (Optional)
     # =========================================================================
     
+    @staticmethod
+    def _canonical_content(message: Dict[str, Any]) -> bytes:
+        """Canonical (key-sorted JSON) bytes of a message, minus its signature."""
+        return orjson.dumps(
+            {k: v for k, v in message.items() if k != "_signature"},
+            option=orjson.OPT_SORT_KEYS,
+        )
+    
+    def _message_digest(
+        self,
+        message: Dict[str, Any],
+        key: Optional[bytes] = None,
+    ) -> bytes:
+        """Raw HMAC-SHA256 digest of a message's canonical content."""
+        if not key or key == self._secret_key_bytes:
+            mac = self._hmac_template.copy()
+        else:
+            mac = hmac.new(key, digestmod=hashlib.sha256)
+        mac.update(self._canonical_content(message))
+        return mac.digest()
+    
     def sign_message(
         self,
         message: Dict[str, Any],
@@ -468,17 +720,11 @@ class WSAuthMiddleware:
         Returns:
             Message with signature
         """
-        key = key or self.secret_key.encode()
-        
-        # Create canonical representation
-        content = str(sorted(message.items()))
-        
-        # Generate signature
-        signature = hmac.new(
-            key,
-            content.encode(),
-            hashlib.sha256,
-        ).hexdigest()
+        # Generate signature over the canonical representation
+        # Unpadded base64url: 43 characters instead of 64 for hex
+        signature = base64.urlsafe_b64encode(
+            self._message_digest(message, key),
+        ).rstrip(b"=").decode("ascii")
         
         return {
             **message,
@@ -490,22 +736,17 @@ class WSAuthMiddleware:
         message: Dict[str, Any],
         key: Optional[bytes] = None,
     ) -> bool:
-        """Verify message signature."""
-        key = key or self.secret_key.encode()
-        
-        if "_signature" not in message:
+        """Verify message signature (the message is not modified)."""
+        signature = message.get("_signature")
+        if not isinstance(signature, str):
             return False
         
-        signature = message.pop("_signature")
-        content = str(sorted(message.items()))
-        
-        expected = hmac.new(
-            key,
-            content.encode(),
-            hashlib.sha256,
-        ).hexdigest()
+        try:
+            signature_bytes = base64.urlsafe_b64decode(signature + "=" * (-len(signature) % 4))
+        except ValueError:
+            return False
         
-        return hmac.compare_digest(signature, expected)
+        return hmac.compare_digest(signature_bytes, self._message_digest(message, key))
     
     # =========================================================================
     # Helper Methods
@@ -526,19 +767,21 @@ class WSAuthMiddleware:
         self,
         headers: Dict[str, str],
     ) -> Optional[str]:
-        """Extract token from request headers."""
-        auth_header = headers.get("Authorization", "")
+        """Extract token from request headers (ASGI names are lowercase)."""
+        auth_header = headers.get("authorization") or headers.get("Authorization", "")
         
-        if auth_header.startswith("Bearer "):
-            return auth_header[7:]
+        token = auth_header.removeprefix("Bearer ")
+        if token != auth_header:
+            return token
         
-        return headers.get("X-Auth-Token")
+        return headers.get("x-auth-token") or headers.get("X-Auth-Token")
     
     def get_connection_stats(self) -> Dict[str, Any]:
         """Get middleware statistics."""
         return {
-            "active_rate_limits": len(self._rate_limits),
+            "active_rate_limits": len(self._rate_limits) + len(self._rate_limit_logs),
             "active_csrf_tokens": len(self._csrf_tokens),
+            "cached_token_verifications": len(self._verify_cache),
             "rate_limit_window": self.rate_limit_window,
             "rate_limit_max": self.rate_limit_max,
             "csrf_token_expiry_seconds": self.csrf_token_expiry,
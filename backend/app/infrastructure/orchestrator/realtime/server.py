@@ -12,24 +12,44 @@ Central hub for all real-time communications including:
 import asyncio
 import hashlib
 import hmac
-import json
 import logging
 import time
+from collections import defaultdict, deque
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Set, Union
+from typing import Any, Callable, Deque, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple, Union
 from uuid import UUID, uuid4
 
+import orjson
 import structlog
+from cachetools import TTLCache
 from redis.asyncio import Redis
 from redis.asyncio.client import PubSub
 
 from app.core.config import Settings, get_settings
+from app.infrastructure.orchestrator.realtime.clock import utc_isoformat
 
 logger = structlog.get_logger(__name__)
 
+# Number of registration lock shards
+_LOCK_SHARDS = 16
+
+# Redis pub/sub channels shared by all server nodes
+_REDIS_CHANNELS = (
+    "realtime:leaderboard",
+    "realtime:notifications",
+    "realtime:admin",
+    "realtime:ad",
+    "realtime:logs",
+)
+
+# Event type used when relaying a Redis channel to local clients
+_REDIS_EVENT_TYPES = {
+    channel: f"redis.{channel.removeprefix('realtime:')}" for channel in _REDIS_CHANNELS
+}
+
 
 # ============================================================================
 # Enums and Data Classes
@@ -92,7 +112,66 @@ class NotificationChannel(str, Enum):
     WEBHOOK = "webhook"
 
 
-@dataclass
+# Redis channel each event type is published on
+_PUBLISH_CHANNELS: Dict[str, str] = {
+    event_type.value: f"realtime:{event_type.value.split('.')[0]}" for event_type in EventType
+}
+
+# Priorities relayed to other nodes via Redis (LOW stays local)
+_PUBLISHED_PRIORITIES = frozenset(
+    priority.value for priority in NotificationPriority if priority is not NotificationPriority.LOW
+)
+
+# Delivery channels used when a notification names none
+_DEFAULT_CHANNELS = (NotificationChannel.IN_APP.value,)
+
+# Channel enum tuple -> value tuple, filled on first use
+_CHANNEL_VALUES_CACHE: Dict[Tuple[NotificationChannel, ...], Tuple[str, ...]] = {}
+
+
+def _channel_values(channels: Optional[List[NotificationChannel]]) -> Tuple[str, ...]:
+    """Get the string values for a list of delivery channels."""
+    if not channels:
+        return _DEFAULT_CHANNELS
+    
+    key = tuple(channels)
+    values = _CHANNEL_VALUES_CACHE.get(key)
+    if values is None:
+        values = _CHANNEL_VALUES_CACHE[key] = tuple(channel.value for channel in key)
+    return values
+
+
+def _merge_leaderboard_diffs(
+    older: Dict[str, Any],
+    newer: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    """
+    Merge two consecutive leaderboard diffs into one carrying both changes.
+    
+    Rows are keyed by team_id, keeping the earliest old_position and the
+    latest new_position and entry. A full snapshot replaces what came
+    before it.
+    
+    Returns:
+        Merged data, or None if the two cannot be merged
+    """
+    if newer.get("type") == "full":
+        return newer
+    if older.get("type") != "diff" or newer.get("type") != "diff":
+        return None
+    
+    rows = {row.get("team_id"): row for row in older.get("entries", ())}
+    for row in newer.get("entries", ()):
+        team_id = row.get("team_id")
+        previous = rows.get(team_id)
+        if previous is not None:
+            row = {**row, "old_position": previous.get("old_position")}
+        rows[team_id] = row
+    
+    return {**newer, "entries": list(rows.values())}
+
+
+@dataclass(slots=True)
 class UserInfo:
     """Information about a connected user."""
     user_id: UUID
@@ -103,6 +182,13 @@ class UserInfo:
     connected_at: datetime = field(default_factory=datetime.utcnow)
     last_seen: datetime = field(default_factory=datetime.utcnow)
     is_anonymous: bool = False
+    user_id_str: str = field(init=False, repr=False, compare=False)
+    team_id_str: Optional[str] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self) -> None:
+        # Stringified once for logs and event payloads
+        self.user_id_str = str(self.user_id)
+        self.team_id_str = str(self.team_id) if self.team_id else None
 
 
 @dataclass
@@ -113,7 +199,7 @@ class RateLimitConfig:
     window_seconds: int = 60
 
 
-@dataclass
+@dataclass(slots=True)
 class EventMessage:
     """Standard event message format."""
     id: str = field(default_factory=lambda: str(uuid4()))
@@ -121,9 +207,24 @@ class EventMessage:
     channel: str = "global"
     priority: str = NotificationPriority.NORMAL.value
     data: Dict[str, Any] = field(default_factory=dict)
-    timestamp: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    timestamp: str = field(default_factory=utc_isoformat)
     source: str = "cerb"
     version: str = "1.0"
+    _json: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    
+    def to_json(self) -> str:
+        """
+        Serialize the event to JSON.
+        
+        The result is memoized on the instance so fan-out paths serialize
+        each event once; events must not be mutated after being sent.
+        """
+        payload = self._json
+        if payload is None:
+            # orjson serializes dataclass fields directly and skips "_json"
+            payload = orjson.dumps(self).decode()
+            self._json = payload
+        return payload
 
 
 # ============================================================================
@@ -150,15 +251,43 @@ class RealtimeServer:
         self.pubsub: Optional[PubSub] = None
         self._running = False
         self._subscriptions_task: Optional[asyncio.Task] = None
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self._keepalive_interval = 15
+        
+        # Outbound Redis publishes, pipelined by a background worker
+        self._publish_queue: asyncio.Queue = asyncio.Queue()
+        self._publish_task: Optional[asyncio.Task] = None
+        self._publish_batch_size = 64
+        self._publish_linger = 0.005
+        
+        # Connection ids: per-process prefix plus a counter, unique across nodes
+        self._node_id = uuid4().hex[:12]
+        self._next_conn_id = 0
         
         # Connection storage
         self._connections: Dict[str, Set[Any]] = {}  # room_id -> connections
         self._user_connections: Dict[UUID, Set[Any]] = {}  # user_id -> connections
         self._user_info: Dict[UUID, UserInfo] = {}  # user_id -> info
-        self._presence: Dict[str, Set[str]] = {}  # room_id -> usernames
+        self._presence: Dict[str, Dict[str, int]] = {}  # room_id -> username -> connection count
+        self._conn_rooms: Dict[Any, Set[str]] = {}  # websocket -> joined room_ids
+        self._conn_usernames: Dict[Any, str] = {}  # websocket -> username
+        
+        # Materialized target sets, kept up to date on join/leave
+        self._all_connections: Set[Any] = set()
+        self._group_unions: Dict[FrozenSet[str], Set[Any]] = {}  # room group -> connections
+        self._room_groups: Dict[str, List[FrozenSet[str]]] = {}  # room_id -> cached groups
+        self._group_cache_size = 1024
+        
+        # Outbound queues drained by one writer task per connection
+        self._out_queues: Dict[Any, asyncio.Queue] = {}  # websocket -> (message, urgent)
+        self._writers: Dict[Any, asyncio.Task] = {}  # websocket -> writer task
+        self._out_queue_size = 256
+        self._writer_batch_size = 32
+        self._dropped_messages = 0
         
         # Rate limiting
-        self._rate_limits: Dict[str, Dict[str, Any]] = {}
+        # key -> (tokens, last refill); idle buckets expire once they would be full again anyway
+        self._rate_limits: TTLCache = TTLCache(maxsize=100_000, ttl=300)
         self._rate_limit_config = {
             EventType.CHALLENGE_ATTEMPT.value: RateLimitConfig(events_per_second=5, burst_limit=20),
             EventType.NOTIFICATION.value: RateLimitConfig(events_per_second=20, burst_limit=100),
@@ -168,9 +297,26 @@ class RealtimeServer:
         # Event handlers
         self._event_handlers: Dict[str, List[Callable]] = {}
         
-        # Message backlog for reconnection
-        self._message_backlog: Dict[str, List[EventMessage]] = {}
+        # Redis channel -> local handlers, called with (channel, data)
+        self._channel_handlers: Dict[str, List[Callable]] = {
+            channel: [self._relay_redis_message] for channel in _REDIS_CHANNELS
+        }
+        
+        # Message backlog for reconnection (room_id -> serialized events)
         self._backlog_max_size = 1000
+        self._message_backlog: Dict[str, Deque[str]] = defaultdict(
+            lambda: deque(maxlen=self._backlog_max_size)
+        )
+        
+        # High-frequency events coalesced per flush window
+        self._pending_events: Dict[Tuple[str, Tuple[str, ...]], EventMessage] = {}
+        self._pending_logs: Dict[Tuple[str, Tuple[str, ...]], Tuple[List[str], str]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._coalesce_interval = 0.05
+        
+        # One heartbeat timer shared by all connections
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._heartbeat_interval = 30
         
         # Scoreboard freeze state
         self._scoreboard_frozen = False
@@ -179,9 +325,11 @@ class RealtimeServer:
         
         # Anonymous mode
         self._anonymous_mode = False
+        self._anonymous_names: Dict[Tuple[str, str], str] = {}  # (label, id) -> masked name
         
-        # Lock for thread safety
-        self._lock = asyncio.Lock()
+        # Registration locks, sharded by user so unrelated connects don't serialize.
+        # Broadcast and rate limiting are lock-free: they never await mid-update.
+        self._locks = [asyncio.Lock() for _ in range(_LOCK_SHARDS)]
         
         logger.info("RealtimeServer initialized")
     
@@ -196,20 +344,19 @@ class RealtimeServer:
         
         # Subscribe to event channels
         self.pubsub = self.redis.pubsub()
-        await self.pubsub.subscribe(
-            "realtime:leaderboard",
-            "realtime:notifications",
-            "realtime:admin",
-            "realtime:ad",
-            "realtime:logs",
-        )
+        await self.pubsub.subscribe(*_REDIS_CHANNELS)
         
         self._subscriptions_task = asyncio.create_task(self._handle_redis_messages())
+        self._keepalive_task = asyncio.create_task(self._keepalive())
+        self._publish_task = asyncio.create_task(self._publish_worker())
     
     async def disconnect(self) -> None:
         """Disconnect from Redis and cleanup."""
         self._running = False
         
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+        
         if self._subscriptions_task:
             self._subscriptions_task.cancel()
             try:
@@ -217,6 +364,20 @@ class RealtimeServer:
             except asyncio.CancelledError:
                 pass
         
+        if self._flush_task:
+            self._flush_task.cancel()
+        
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        
+        if self._publish_task:
+            self._publish_task.cancel()
+            try:
+                await self._publish_task
+            except asyncio.CancelledError:
+                pass
+        
         if self.pubsub:
             await self.pubsub.unsubscribe()
             await self.pubsub.close()
@@ -244,7 +405,7 @@ class RealtimeServer:
         self,
         websocket: Any,
         user_info: UserInfo,
-        rooms: Optional[List[str]] = None,
+        rooms: Optional[Sequence[str]] = None,
     ) -> str:
         """
         Register a new WebSocket connection.
@@ -252,34 +413,41 @@ class RealtimeServer:
         Returns:
             connection_id: Unique identifier for this connection
         """
-        connection_id = str(uuid4())
+        self._next_conn_id += 1
+        connection_id = f"{self._node_id}-{self._next_conn_id}"
         
-        async with self._lock:
+        async with self._user_lock(user_info.user_id):
             # Store user info
             self._user_info[user_info.user_id] = user_info
             
             # Add to user connections
-            if user_info.user_id not in self._user_connections:
-                self._user_connections[user_info.user_id] = set()
-            self._user_connections[user_info.user_id].add(websocket)
+            self._user_connections.setdefault(user_info.user_id, set()).add(websocket)
+            
+            # Start the outbound writer
+            if websocket not in self._out_queues:
+                queue: asyncio.Queue = asyncio.Queue(maxsize=self._out_queue_size)
+                self._out_queues[websocket] = queue
+                self._writers[websocket] = asyncio.create_task(self._writer(websocket, queue))
+            
+            if self._heartbeat_task is None:
+                self._heartbeat_task = asyncio.create_task(self._heartbeat())
             
             # Add to global room
-            await self._join_room(websocket, "global", user_info.username)
+            self._join_room(websocket, "global", user_info.username)
             
             # Add to requested rooms
             if rooms:
-                for room in rooms:
-                    await self._join_room(websocket, room, user_info.username)
+                self.join_rooms(websocket, rooms, user_info.username)
             
             # Add to team room if applicable
             if user_info.team_id and not user_info.is_anonymous:
                 team_room = f"team:{user_info.team_id}"
-                await self._join_room(websocket, team_room, user_info.username)
+                self._join_room(websocket, team_room, user_info.username)
             
             logger.info(
                 "Connection registered",
                 connection_id=connection_id,
-                user_id=str(user_info.user_id),
+                user_id=user_info.user_id_str,
                 rooms=rooms or [],
             )
         
@@ -291,7 +459,7 @@ class RealtimeServer:
         user_id: UUID,
     ) -> None:
         """Unregister a WebSocket connection."""
-        async with self._lock:
+        async with self._user_lock(user_id):
             # Remove from user connections
             if user_id in self._user_connections:
                 self._user_connections[user_id].discard(websocket)
@@ -302,32 +470,117 @@ class RealtimeServer:
                     if user_id in self._user_info:
                         del self._user_info[user_id]
             
-            # Remove from all rooms
-            for room_id, connections in list(self._connections.items()):
-                if websocket in connections:
-                    connections.discard(websocket)
-                    
-                    # Update presence
-                    if room_id in self._presence:
-                        # Remove user from presence (need to track per-user)
-                        pass
+            # Stop the outbound writer
+            self._out_queues.pop(websocket, None)
+            writer = self._writers.pop(websocket, None)
+            if writer:
+                writer.cancel()
+            
+            # Remove from the rooms this connection joined
+            self.leave_rooms(websocket, tuple(self._conn_rooms.get(websocket, ())))
+            self._conn_rooms.pop(websocket, None)
+            self._conn_usernames.pop(websocket, None)
+            self._all_connections.discard(websocket)
             
             logger.info("Connection unregistered", user_id=str(user_id))
     
-    async def _join_room(
+    def _user_lock(self, user_id: UUID) -> asyncio.Lock:
+        """Get the registration lock shard for a user."""
+        return self._locks[user_id.int % _LOCK_SHARDS]
+    
+    def join_rooms(
+        self,
+        websocket: Any,
+        room_ids: Sequence[str],
+        username: str,
+    ) -> None:
+        """
+        Add a connection to several rooms.
+        
+        Joining only touches in-process state, so the whole batch runs
+        without yielding to the event loop.
+        """
+        for room_id in room_ids:
+            self._join_room(websocket, room_id, username)
+    
+    def _join_room(
         self,
         websocket: Any,
         room_id: str,
         username: str,
     ) -> None:
         """Add connection to a room."""
-        if room_id not in self._connections:
-            self._connections[room_id] = set()
-        self._connections[room_id].add(websocket)
+        joined = self._conn_rooms.setdefault(websocket, set())
+        if room_id in joined:
+            return
+        joined.add(room_id)
+        self._conn_usernames[websocket] = username
+        self._all_connections.add(websocket)
+        
+        for group in self._room_groups.get(room_id, ()):
+            self._group_unions[group].add(websocket)
+        
+        self._connections.setdefault(room_id, set()).add(websocket)
+        
+        presence = self._presence.setdefault(room_id, {})
+        presence[username] = presence.get(username, 0) + 1
+    
+    def leave_rooms(self, websocket: Any, room_ids: Iterable[str]) -> None:
+        """Remove a connection from several rooms in one call."""
+        for room_id in room_ids:
+            self._leave_room(websocket, room_id)
+    
+    def _leave_room(self, websocket: Any, room_id: str) -> None:
+        """Remove connection from a room."""
+        joined = self._conn_rooms.get(websocket)
+        if not joined or room_id not in joined:
+            return
+        joined.discard(room_id)
+        
+        for group in self._room_groups.get(room_id, ()):
+            if joined.isdisjoint(group):
+                self._group_unions[group].discard(websocket)
         
-        if room_id not in self._presence:
-            self._presence[room_id] = set()
-        self._presence[room_id].add(username)
+        connections = self._connections.get(room_id)
+        if connections is not None:
+            connections.discard(websocket)
+            if not connections:
+                del self._connections[room_id]
+        
+        # Drop the username once its last connection leaves the room
+        presence = self._presence.get(room_id)
+        username = self._conn_usernames.get(websocket)
+        if presence is not None and username in presence:
+            presence[username] -= 1
+            if presence[username] <= 0:
+                del presence[username]
+            if not presence:
+                del self._presence[room_id]
+    
+    def _room_connections(self, rooms: List[str]) -> Set[Any]:
+        """
+        Get the connections in any of the given rooms.
+        
+        Unions of several rooms are cached and maintained on join/leave, so
+        repeated broadcasts to the same room group don't rebuild the set.
+        The returned set must not be mutated.
+        """
+        if len(rooms) == 1:
+            return self._connections.get(rooms[0], set())
+        
+        group = frozenset(rooms)
+        connections = self._group_unions.get(group)
+        if connections is None:
+            if len(self._group_unions) >= self._group_cache_size:
+                self._group_unions.clear()
+                self._room_groups.clear()
+            
+            connections = set().union(*(self._connections.get(room, ()) for room in group))
+            self._group_unions[group] = connections
+            for room in group:
+                self._room_groups.setdefault(room, []).append(group)
+        
+        return connections
     
     # =========================================================================
     # Event Broadcasting
@@ -350,46 +603,67 @@ class RealtimeServer:
         Returns:
             Number of clients that received the event
         """
-        message = event.model_dump_json()
-        
-        # Determine target connections
-        target_connections: Set[Any] = set()
+        sent_count = self._dispatch(event, rooms, exclude_user)
         
-        if rooms:
-            for room in rooms:
-                if room in self._connections:
-                    target_connections.update(self._connections[room])
-        else:
-            for connections in self._connections.values():
-                target_connections.update(connections)
+        logger.debug(
+            "Broadcast event",
+            event_type=event.type,
+            recipient_count=sent_count,
+        )
         
-        # Exclude specific user
-        if exclude_user and exclude_user in self._user_connections:
-            user_conns = self._user_connections[exclude_user]
-            target_connections = target_connections - user_conns
+        return sent_count
+    
+    async def _multi_broadcast(
+        self,
+        events: List[Tuple[EventMessage, List[str]]],
+    ) -> int:
+        """
+        Broadcast several events, each to its own rooms, in one pass.
         
-        # Send to all target connections
+        Returns:
+            Total number of deliveries queued
+        """
         sent_count = 0
-        for conn in target_connections:
-            try:
-                await conn.send_text(message)
-                sent_count += 1
-            except Exception as e:
-                logger.debug("Failed to send to connection", error=str(e))
-        
-        # Store in Redis for scaling
-        if self.redis and event.priority != NotificationPriority.LOW.value:
-            channel = f"realtime:{event.type.split('.')[0]}"
-            await self.redis.publish(channel, message)
+        for event, rooms in events:
+            sent_count += self._dispatch(event, rooms)
         
         logger.debug(
-            "Broadcast event",
-            event_type=event.type,
+            "Broadcast events",
+            event_types=[event.type for event, _ in events],
             recipient_count=sent_count,
         )
         
         return sent_count
     
+    def _dispatch(
+        self,
+        event: EventMessage,
+        rooms: Optional[List[str]] = None,
+        exclude_user: Optional[UUID] = None,
+    ) -> int:
+        """Serialize an event, queue it for its targets and for Redis."""
+        message = event.to_json()
+        
+        # Determine target connections
+        if rooms:
+            target_connections = self._room_connections(rooms)
+        else:
+            target_connections = self._all_connections
+        
+        # Exclude specific user (skipped while queueing, without copying the target set)
+        excluded = self._user_connections.get(exclude_user) if exclude_user else None
+        
+        # Queue for all target connections
+        urgent = event.priority == NotificationPriority.URGENT.value
+        sent_count = self._enqueue(target_connections, message, excluded, urgent)
+        
+        # Store in Redis for scaling
+        if self.redis and event.priority in _PUBLISHED_PRIORITIES:
+            channel = _PUBLISH_CHANNELS.get(event.type) or f"realtime:{event.type.split('.')[0]}"
+            self._publish_queue.put_nowait((channel, message))
+        
+        return sent_count
+    
     async def send_to_user(
         self,
         user_id: UUID,
@@ -399,17 +673,110 @@ class RealtimeServer:
         if user_id not in self._user_connections:
             return False
         
-        message = event.model_dump_json()
-        sent = False
+        message = event.to_json()
+        urgent = event.priority == NotificationPriority.URGENT.value
+        sent_count = self._enqueue(self._user_connections[user_id], message, urgent=urgent)
         
-        for conn in self._user_connections[user_id]:
-            try:
-                await conn.send_text(message)
-                sent = True
-            except Exception as e:
-                logger.debug("Failed to send to user", error=str(e))
+        return sent_count > 0
+    
+    def _enqueue(
+        self,
+        connections: Set[Any],
+        message: str,
+        excluded: Optional[Set[Any]] = None,
+        urgent: bool = False,
+    ) -> int:
+        """
+        Queue a message on each connection's outbound queue without blocking.
+        
+        A full queue drops its oldest message so slow clients cannot stall
+        the broadcaster or grow without bound. Urgent messages are never
+        dropped: if the oldest queued message is itself urgent, the client
+        is too far behind and its connection is closed instead.
+        
+        Args:
+            connections: Target connections
+            message: Serialized event
+            excluded: Connections to skip
+            urgent: Whether the message is an URGENT event
+        
+        Returns:
+            Number of connections the message was queued for
+        """
+        queues = self._out_queues
+        item = (message, urgent)
+        queued = 0
+        slow = None
+        for conn in connections:
+            if excluded and conn in excluded:
+                continue
+            queue = queues.get(conn)
+            if queue is None:
+                continue
+            
+            if queue.full():
+                _, dropped_urgent = queue.get_nowait()
+                self._dropped_messages += 1
+                if dropped_urgent:
+                    slow = slow or []
+                    slow.append(conn)
+                    continue
+            queue.put_nowait(item)
+            queued += 1
+        
+        # Closed after the loop, since connections may be a live room set
+        if slow:
+            for conn in slow:
+                self._close_slow_consumer(conn)
+        
+        return queued
+    
+    def _close_slow_consumer(self, websocket: Any) -> None:
+        """Stop writing to a connection that cannot keep up and close it."""
+        queue = self._out_queues.pop(websocket, None)
+        if queue is not None:
+            self._dropped_messages += queue.qsize()
+        writer = self._writers.get(websocket)
+        if writer:
+            writer.cancel()
+        
+        # Kept as the connection's task so unregister_connection cleans it up
+        self._writers[websocket] = asyncio.create_task(self._close_connection(websocket, 1013))
         
-        return sent
+        logger.warning("Closing slow WebSocket consumer")
+    
+    async def _close_connection(self, websocket: Any, code: int) -> None:
+        """Close a connection, ignoring sockets that are already gone."""
+        try:
+            await websocket.close(code=code)
+        except Exception as e:
+            logger.debug("Failed to close connection", error=str(e))
+    
+    async def _heartbeat(self) -> None:
+        """Queue one shared heartbeat frame to every connection each interval."""
+        while True:
+            await asyncio.sleep(self._heartbeat_interval)
+            if self._all_connections:
+                message = orjson.dumps({
+                    "type": EventType.HEARTBEAT.value,
+                    "timestamp": utc_isoformat(),
+                }).decode()
+                self._enqueue(self._all_connections, message)
+    
+    async def _writer(self, websocket: Any, queue: asyncio.Queue) -> None:
+        """Drain a connection's outbound queue onto its socket."""
+        try:
+            while True:
+                batch = [await queue.get()]
+                while len(batch) < self._writer_batch_size and not queue.empty():
+                    batch.append(queue.get_nowait())
+                
+                for message, _ in batch:
+                    await websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug("Failed to send to connection", error=str(e))
     
     async def send_to_room(
         self,
@@ -434,6 +801,9 @@ class RealtimeServer:
         """
         Update the leaderboard and broadcast to all clients.
         
+        Full updates within one coalescing window are collapsed to the
+        latest; diffs are merged so no team's change is lost.
+        
         Args:
             leaderboard_data: Full or diff leaderboard data
             diff_mode: If True, compute and send only changed positions
@@ -446,6 +816,9 @@ class RealtimeServer:
             }
             return
         
+        # Anonymize once for all recipients
+        leaderboard_data = self.anonymize_leaderboard(leaderboard_data)
+        
         if diff_mode:
             event = EventMessage(
                 type=EventType.LEADERBOARD_DIFF.value,
@@ -459,7 +832,7 @@ class RealtimeServer:
                 data=leaderboard_data,
             )
         
-        await self.broadcast(event, rooms=["leaderboard", "global"])
+        await self._coalesce(event, ["leaderboard", "global"])
     
     async def freeze_leaderboard(self) -> None:
         """Freeze the leaderboard (stop updates, show cached data)."""
@@ -503,24 +876,48 @@ class RealtimeServer:
     def set_anonymous_mode(self, enabled: bool) -> None:
         """Enable or disable anonymous mode (mask names in transit)."""
         self._anonymous_mode = enabled
+        self._anonymous_names.clear()
     
     def anonymize_leaderboard(self, leaderboard_data: Dict[str, Any]) -> Dict[str, Any]:
         """Mask team/user names for anonymous mode."""
         if not self._anonymous_mode:
             return leaderboard_data
         
-        # Create anonymized copy
+        # Create anonymized copy without touching the caller's entries
         anonymized = leaderboard_data.copy()
         
         if "entries" in anonymized:
-            for entry in anonymized["entries"]:
-                entry["team_name"] = f"Team {entry.get('team_id', '???')[:8]}"
-                if "members" in entry:
-                    for member in entry["members"]:
-                        member["username"] = f"Player {member.get('user_id', '???')[:8]}"
+            anonymized["entries"] = [
+                self._anonymize_entry(entry) for entry in anonymized["entries"]
+            ]
         
         return anonymized
     
+    def _anonymize_entry(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Mask one leaderboard entry, or the entry nested in a diff row."""
+        if "entry" in entry:
+            return {**entry, "entry": self._anonymize_entry(entry["entry"])}
+        
+        anonymized = {
+            **entry,
+            "team_name": self._anonymous_name("Team", entry.get("team_id", "???")),
+        }
+        if "members" in entry:
+            anonymized["members"] = [
+                {**member, "username": self._anonymous_name("Player", member.get("user_id", "???"))}
+                for member in entry["members"]
+            ]
+        
+        return anonymized
+    
+    def _anonymous_name(self, label: str, entity_id: str) -> str:
+        """Get the masked name for an id, formatted once per anonymous-mode session."""
+        key = (label, entity_id)
+        name = self._anonymous_names.get(key)
+        if name is None:
+            name = self._anonymous_names[key] = f"{label} {entity_id[:8]}"
+        return name
+    
     # =========================================================================
     # Notification Methods
     # =========================================================================
@@ -544,7 +941,7 @@ class RealtimeServer:
                 "title": title,
                 "message": message,
                 "notification_type": notification_type,
-                "channels": [c.value for c in channels] if channels else [NotificationChannel.IN_APP.value],
+                "channels": _channel_values(channels),
                 "data": data or {},
             },
         )
@@ -570,7 +967,7 @@ class RealtimeServer:
                 "title": title,
                 "message": message,
                 "notification_type": notification_type,
-                "channels": [c.value for c in channels] if channels else [NotificationChannel.IN_APP.value],
+                "channels": _channel_values(channels),
             },
         )
         
@@ -587,7 +984,23 @@ class RealtimeServer:
         team_name: Optional[str],
     ) -> None:
         """Broadcast first blood notification."""
-        event = EventMessage(
+        event = self._first_blood_event(
+            challenge_id, challenge_name, solver_id, solver_name, team_id, team_name
+        )
+        
+        await self.broadcast(event, rooms=["notifications", "global", f"challenge:{challenge_id}"])
+    
+    def _first_blood_event(
+        self,
+        challenge_id: UUID,
+        challenge_name: str,
+        solver_id: UUID,
+        solver_name: str,
+        team_id: Optional[UUID],
+        team_name: Optional[str],
+    ) -> EventMessage:
+        """Build the first blood notification event."""
+        return EventMessage(
             type=EventType.CHALLENGE_FIRST_BLOOD.value,
             channel="notifications",
             priority=NotificationPriority.HIGH.value,
@@ -600,8 +1013,6 @@ class RealtimeServer:
                 "team_name": team_name,
             },
         )
-        
-        await self.broadcast(event, rooms=["notifications", "global", f"challenge:{challenge_id}"])
     
     async def emit_challenge_solve(
         self,
@@ -626,7 +1037,7 @@ class RealtimeServer:
             channel="admin",
             data=event_data,
         )
-        await self.broadcast(admin_event, rooms=["admin"])
+        events = [(admin_event, ["admin"])]
         
         # Broadcast to team
         if team_id:
@@ -635,11 +1046,11 @@ class RealtimeServer:
                 channel="challenges",
                 data=event_data,
             )
-            await self.broadcast(team_event, rooms=[f"team:{team_id}"])
+            events.append((team_event, [f"team:{team_id}"]))
         
         # Broadcast to global (for leaderboard)
         if is_first_blood:
-            await self.emit_first_blood(
+            first_blood_event = self._first_blood_event(
                 challenge_id,
                 "",  # challenge_name
                 user_id,
@@ -647,6 +1058,11 @@ class RealtimeServer:
                 team_id,
                 "",  # team_name
             )
+            events.append(
+                (first_blood_event, ["notifications", "global", f"challenge:{challenge_id}"])
+            )
+        
+        await self._multi_broadcast(events)
     
     # =========================================================================
     # Admin Monitoring Methods
@@ -658,7 +1074,7 @@ class RealtimeServer:
     
     async def get_room_presence(self, room_id: str) -> Dict[str, Any]:
         """Get presence information for a room."""
-        presence = self._presence.get(room_id, set())
+        presence = self._presence.get(room_id, {})
         return {
             "room_id": room_id,
             "user_count": len(presence),
@@ -696,7 +1112,7 @@ class RealtimeServer:
         tick_duration: int,
         scores: Dict[str, Any],
     ) -> None:
-        """Broadcast AD game tick update."""
+        """Broadcast AD game tick update (latest tick per coalescing window)."""
         event = EventMessage(
             type=EventType.AD_TICK.value,
             channel="ad",
@@ -709,7 +1125,7 @@ class RealtimeServer:
             },
         )
         
-        await self.broadcast(event, rooms=["ad", "global"])
+        await self._coalesce(event, ["ad", "global"])
     
     async def broadcast_flag_rotation(
         self,
@@ -754,18 +1170,89 @@ class RealtimeServer:
         log_data: Dict[str, Any],
         target_rooms: List[str],
     ) -> None:
-        """Stream container logs to specified rooms."""
-        event = EventMessage(
-            type=EventType.CONTAINER_LOG.value,
-            channel="logs",
-            data={
-                "container_id": container_id,
-                "logs": log_data.get("logs", ""),
-                "timestamp": log_data.get("timestamp", datetime.utcnow().isoformat()),
-            },
-        )
+        """
+        Stream container logs to specified rooms.
+        
+        Chunks for the same container and rooms are concatenated and sent
+        as one frame per coalescing window.
+        """
+        key = (container_id, tuple(target_rooms))
+        pending = self._pending_logs.get(key)
+        if pending is None:
+            timestamp = log_data.get("timestamp") or utc_isoformat()
+            self._pending_logs[key] = ([log_data.get("logs", "")], timestamp)
+        else:
+            pending[0].append(log_data.get("logs", ""))
         
-        await self.broadcast(event, rooms=target_rooms)
+        self._schedule_flush()
+    
+    # =========================================================================
+    # Coalescing
+    # =========================================================================
+    
+    async def _coalesce(self, event: EventMessage, rooms: List[str]) -> None:
+        """
+        Buffer an event so only the latest per (type, rooms) is sent each window.
+        
+        Leaderboard diffs are incremental, so a pending diff is merged with
+        the new one rather than replaced; a full update supersedes both.
+        """
+        if event.priority == NotificationPriority.URGENT.value:
+            await self.broadcast(event, rooms=rooms)
+            return
+        
+        room_key = tuple(rooms)
+        key = (event.type, room_key)
+        pending = self._pending_events.pop(key, None)
+        
+        if event.type == EventType.LEADERBOARD_UPDATE.value:
+            self._pending_events.pop((EventType.LEADERBOARD_DIFF.value, room_key), None)
+        elif pending is not None and event.type == EventType.LEADERBOARD_DIFF.value:
+            merged = _merge_leaderboard_diffs(pending.data, event.data)
+            if merged is None:
+                # Keep both, in order
+                await self.broadcast(pending, rooms=rooms)
+            else:
+                event = EventMessage(
+                    type=event.type,
+                    channel=event.channel,
+                    priority=event.priority,
+                    data=merged,
+                )
+        
+        # Re-inserted so the flush sends events in arrival order
+        self._pending_events[key] = event
+        self._schedule_flush()
+    
+    def _schedule_flush(self) -> None:
+        """Start a flush for the current coalescing window if none is pending."""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_pending())
+    
+    async def _flush_pending(self) -> None:
+        """Broadcast the events buffered during one coalescing window."""
+        try:
+            await asyncio.sleep(self._coalesce_interval)
+        finally:
+            self._flush_task = None
+        
+        events, self._pending_events = self._pending_events, {}
+        logs, self._pending_logs = self._pending_logs, {}
+        
+        for (_, rooms), event in events.items():
+            await self.broadcast(event, rooms=list(rooms))
+        
+        for (container_id, rooms), (chunks, timestamp) in logs.items():
+            event = EventMessage(
+                type=EventType.CONTAINER_LOG.value,
+                channel="logs",
+                data={
+                    "container_id": container_id,
+                    "logs": "".join(chunks),
+                    "timestamp": timestamp,
+                },
+            )
+            await self.broadcast(event, rooms=list(rooms))
     
     # =========================================================================
     # Rate Limiting
@@ -779,67 +1266,100 @@ class RealtimeServer:
         """
         Check if an event is rate limited for a user.
         
+        Uses a token bucket holding up to burst_limit tokens and refilled
+        at events_per_second. The read-modify-write has no await in it,
+        so no lock is needed.
+        
         Returns:
             True if allowed, False if rate limited
         """
         config = self._rate_limit_config.get(event_type, RateLimitConfig())
         key = f"{user_id}:{event_type}"
+        now = time.monotonic()
         
-        async with self._lock:
-            now = time.time()
-            window_start = now - config.window_seconds
-            
-            if key not in self._rate_limits:
-                self._rate_limits[key] = {
-                    "count": 0,
-                    "window_start": now,
-                }
-            
-            rate_data = self._rate_limits[key]
-            
-            # Reset window if expired
-            if rate_data["window_start"] < window_start:
-                rate_data["count"] = 0
-                rate_data["window_start"] = now
-            
-            # Check limit
-            if rate_data["count"] >= config.burst_limit:
-                return False
-            
-            rate_data["count"] += 1
-            return True
+        tokens, last = self._rate_limits.get(key, (config.burst_limit, now))
+        tokens = min(config.burst_limit, tokens + (now - last) * config.events_per_second)
+        
+        if tokens < 1:
+            self._rate_limits[key] = (tokens, now)
+            return False
+        
+        self._rate_limits[key] = (tokens - 1, now)
+        return True
     
     # =========================================================================
     # Redis Pub/Sub Handling
     # =========================================================================
     
     async def _handle_redis_messages(self) -> None:
-        """Handle incoming messages from Redis pub/sub."""
-        while self._running:
+        """
+        Handle incoming messages from Redis pub/sub.
+        
+        Messages are pushed as they arrive; the task runs until cancelled
+        by disconnect() or until the pub/sub has no subscriptions left.
+        """
+        while True:
             try:
-                message = await self.pubsub.get_message(
-                    ignore_subscribe_messages=True,
-                    timeout=1.0,
-                )
-                
-                if message and message["type"] == "message":
-                    channel = message["channel"]
-                    data = json.loads(message["data"])
-                    
-                    # Parse event type from channel
-                    event_type = f"redis.{channel.replace('realtime:', '')}"
+                async for message in self.pubsub.listen():
+                    if message["type"] != "message":
+                        continue
                     
-                    # Broadcast to WebSocket connections
-                    event = EventMessage(
-                        type=event_type,
-                        data=data,
-                    )
-                    await self.broadcast(event)
+                    try:
+                        channel = message["channel"]
+                        data = orjson.loads(message["data"])
+                        
+                        for handler in self._channel_handlers.get(channel, ()):
+                            if asyncio.iscoroutinefunction(handler):
+                                await handler(channel, data)
+                            else:
+                                handler(channel, data)
                     
+                    except Exception as e:
+                        logger.exception("Error handling Redis message", error=str(e))
+                return
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.exception("Error handling Redis message", error=str(e))
+                # Connection lost; listen() reconnects and resubscribes on the next read
+                logger.exception("Redis pub/sub connection error", error=str(e))
                 await asyncio.sleep(1)
     
+    async def _keepalive(self) -> None:
+        """Ping the pub/sub connection so idle subscriptions are kept alive."""
+        while True:
+            await asyncio.sleep(self._keepalive_interval)
+            try:
+                await self.pubsub.ping()
+            except Exception as e:
+                logger.warning("Redis pub/sub ping failed", error=str(e))
+    
+    async def _relay_redis_message(self, channel: str, data: Dict[str, Any]) -> None:
+        """Relay a message published by another node to local WebSocket connections."""
+        event = EventMessage(
+            type=_REDIS_EVENT_TYPES.get(channel) or f"redis.{channel.removeprefix('realtime:')}",
+            data=data,
+        )
+        await self.broadcast(event)
+    
+    async def _publish_worker(self) -> None:
+        """Publish queued broadcasts to Redis, pipelining a batch per round-trip."""
+        while True:
+            items = [await self._publish_queue.get()]
+            
+            # Linger briefly so a burst shares one round-trip
+            if self._publish_queue.empty():
+                await asyncio.sleep(self._publish_linger)
+            while len(items) < self._publish_batch_size and not self._publish_queue.empty():
+                items.append(self._publish_queue.get_nowait())
+            
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for channel, message in items:
+                    pipe.publish(channel, message)
+                await pipe.execute()
+            except Exception as e:
+                logger.exception("Error publishing to Redis", error=str(e), count=len(items))
+    
     # =========================================================================
     # Event Handlers
     # =========================================================================
@@ -854,6 +1374,16 @@ class RealtimeServer:
             self._event_handlers[event_type] = []
         self._event_handlers[event_type].append(handler)
     
+    def add_channel_handler(
+        self,
+        channel: str,
+        handler: Callable,
+    ) -> None:
+        """Add a local handler for messages on a Redis channel."""
+        if channel not in self._channel_handlers:
+            self._channel_handlers[channel] = []
+        self._channel_handlers[channel].append(handler)
+    
     async def _invoke_handlers(
         self,
         event_type: str,
@@ -883,6 +1413,7 @@ class RealtimeServer:
                 room_id: len(connections)
                 for room_id, connections in self._connections.items()
             },
+            "dropped_messages": self._dropped_messages,
             "scoreboard_frozen": self._scoreboard_frozen,
             "anonymous_mode": self._anonymous_mode,
         }
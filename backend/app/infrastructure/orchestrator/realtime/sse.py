@@ -9,11 +9,13 @@ Provides one-way broadcast capabilities for:
 """
 
 import asyncio
-import json
-from datetime import datetime
-from typing import Any, AsyncGenerator, Dict, Optional
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple
 from uuid import UUID
 
+import orjson
 import structlog
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
@@ -21,44 +23,126 @@ from sse_starlette.sse import EventSourceResponse
 
 from app.infrastructure.cache import CacheManager
 from app.infrastructure.database import DatabaseManager
+from app.infrastructure.orchestrator.realtime.clock import utc_isoformat
 
 logger = structlog.get_logger(__name__)
 
 sse_router = APIRouter()
 
+# Redis stream entry ID, e.g. "1700000000000-0"
+_STREAM_ID_RE = re.compile(r"\d+-\d+")
+
+# Pub/sub channel prefix; every worker pattern-subscribes to "sse:*"
+_CHANNEL_PREFIX = "sse:"
+
+# Seconds between client-disconnect checks in the SSE endpoints
+_DISCONNECT_CHECK_INTERVAL = 1.0
+
+# Append an event to the topic's replay stream and publish it, with the
+# stream entry ID spliced in as "id", in one round-trip. The published
+# message is "<id>\n<event type>\n<JSON>" so listeners can forward the JSON
+# without decoding it (see _deliver)
+# KEYS[1] = stream key; ARGV = [maxlen, event type, message JSON, channel]
+_PUBLISH_LUA = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 't', ARGV[2], 'm', ARGV[3])
+redis.call('PUBLISH', ARGV[4], id .. '\\n' .. ARGV[2] .. '\\n{"id":"' .. id .. '",' .. string.sub(ARGV[3], 2))
+return id
+"""
+
 
 # ============================================================================
 # SSE Event Publisher
 # ============================================================================
 
 
+@dataclass(slots=True)
+class SSEMessage:
+    """A published event, serialized once and shared by every subscriber."""
+    id: Optional[str]
+    type: str
+    payload: str
+    _anonymous_payload: Optional[str] = None
+    
+    @classmethod
+    def from_message(cls, message: Dict[str, Any]) -> "SSEMessage":
+        """Build from a message dict, serializing it once."""
+        return cls(
+            id=message.get("id"),
+            type=message.get("type", "message"),
+            payload=orjson.dumps(message).decode(),
+        )
+    
+    def anonymous_payload(self) -> str:
+        """Get the payload with leaderboard names masked, built on first use."""
+        if self._anonymous_payload is None:
+            message = orjson.loads(self.payload)
+            data = message.get("data")
+            if isinstance(data, dict) and "entries" in data:
+                message["data"] = _anonymize_leaderboard(data)
+                self._anonymous_payload = orjson.dumps(message).decode()
+            else:
+                self._anonymous_payload = self.payload
+        return self._anonymous_payload
+
+
 class SSEPublisher:
     """
     Server-Sent Events publisher for one-way broadcasts.
     
     Features:
     - Topic-based subscriptions
-    - Redis-backed for multi-instance support
+    - Redis pub/sub fan-out across workers and instances
     - Automatic reconnection handling
     - Heartbeat keepalive
     """
     
     def __init__(self, cache_manager: CacheManager):
         self.cache = cache_manager
-        self._subscriptions: Dict[str, set] = {}
+        # topic -> subscriber queues; replaced (never mutated) on change so
+        # publish can iterate a snapshot
+        self._subscriptions: Dict[str, Tuple[asyncio.Queue, ...]] = {}
         self._heartbeat_interval = 30  # seconds
+        self._queue_size = 256  # pending messages per subscriber
+        self._replay_size = 100  # approximate messages kept per topic for replay
+        self._dropped_messages = 0
         self._running = False
+        self._publish_script = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
         
         logger.info("SSEPublisher initialized")
     
     async def start(self) -> None:
         """Start the publisher."""
         self._running = True
+        self._publish_script = self.cache.client.register_script(_PUBLISH_LUA)
+        self._listener_task = asyncio.create_task(self._listen())
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
         logger.info("SSEPublisher started")
     
     async def stop(self) -> None:
         """Stop the publisher."""
         self._running = False
+        
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        
+        # Wake subscribers so their streams end
+        for subscribers in self._subscriptions.values():
+            for queue in subscribers:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        
         logger.info("SSEPublisher stopped")
     
     async def publish(
@@ -66,50 +150,106 @@ class SSEPublisher:
         topic: str,
         event_type: str,
         data: Dict[str, Any],
-    ) -> int:
+    ) -> str:
         """
         Publish an event to a topic.
         
+        The event is stored for replay and published on Redis; every worker,
+        including this one, delivers it to its own subscribers from there.
+        
         Args:
             topic: Topic name
             event_type: Event type for SSE
             data: Event data
             
         Returns:
-            Number of subscribers notified
+            Stream entry ID of the event
         """
         message = {
             "type": event_type,
             "data": data,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": utc_isoformat(),
         }
         
-        # Store in Redis for durability
-        await self.cache.redis_client.lpush(
-            f"sse:{topic}",
-            json.dumps(message),
+        return await self._publish_script(
+            keys=[_stream_key(topic)],
+            args=[self._replay_size, event_type, orjson.dumps(message), _CHANNEL_PREFIX + topic],
         )
+    
+    def _deliver(self, topic: str, data: str) -> int:
+        """
+        Queue a published event for this process's subscribers to a topic.
         
-        # Trim to last 100 messages
-        await self.cache.redis_client.ltrim(f"sse:{topic}", 0, 99)
+        The ID and type come from the header lines _PUBLISH_LUA prepends, so
+        the JSON payload is forwarded as-is.
         
-        # Publish to subscribers
-        count = 0
-        if topic in self._subscriptions:
-            for queue in self._subscriptions[topic]:
-                try:
-                    await queue.put(message)
-                    count += 1
-                except Exception:
-                    pass
+        Subscribers are never waited on; a full queue drops its oldest
+        message so the latest state still gets through.
+        
+        Returns:
+            Number of subscribers notified
+        """
+        subscribers = self._subscriptions.get(topic, ())
+        if not subscribers:
+            return 0
+        
+        event_id, event_type, payload = data.split("\n", 2)
+        event = SSEMessage(id=event_id, type=event_type, payload=payload)
+        for queue in subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self._dropped_messages += 1
+            queue.put_nowait(event)
         
-        return count
+        return len(subscribers)
+    
+    async def _heartbeat(self) -> None:
+        """Queue one shared heartbeat to every subscriber each interval."""
+        while True:
+            await asyncio.sleep(self._heartbeat_interval)
+            
+            event = SSEMessage.from_message({
+                "type": "heartbeat",
+                "data": {"timestamp": utc_isoformat()},
+            })
+            for subscribers in self._subscriptions.values():
+                for queue in subscribers:
+                    # A subscriber with messages pending doesn't need a keepalive
+                    if not queue.full():
+                        queue.put_nowait(event)
+    
+    async def _listen(self) -> None:
+        """Deliver events published by any worker to local subscribers."""
+        pubsub = self.cache.client.pubsub()
+        await pubsub.psubscribe(f"{_CHANNEL_PREFIX}*")
+        prefix_len = len(_CHANNEL_PREFIX)
+        
+        try:
+            while True:
+                try:
+                    async for message in pubsub.listen():
+                        if message["type"] != "pmessage":
+                            continue
+                        
+                        try:
+                            self._deliver(message["channel"][prefix_len:], message["data"])
+                        except Exception as e:
+                            logger.exception("Error delivering SSE event", error=str(e))
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Connection lost; listen() reconnects and resubscribes on the next read
+                    logger.exception("SSE pub/sub connection error", error=str(e))
+                    await asyncio.sleep(1)
+        finally:
+            await pubsub.close()
     
     async def subscribe(
         self,
         topic: str,
         last_event_id: Optional[str] = None,
-    ) -> AsyncGenerator[Dict[str, Any], None]:
+    ) -> AsyncGenerator[SSEMessage, None]:
         """
         Subscribe to a topic and yield events.
         
@@ -118,14 +258,12 @@ class SSEPublisher:
             last_event_id: Last event ID for replay
             
         Yields:
-            Event dictionaries
+            Serialized events
         """
-        queue: asyncio.Queue = asyncio.Queue()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
         
         # Register subscription
-        if topic not in self._subscriptions:
-            self._subscriptions[topic] = set()
-        self._subscriptions[topic].add(queue)
+        self._subscriptions[topic] = self._subscriptions.get(topic, ()) + (queue,)
         
         try:
             # Send missed messages if last_event_id provided
@@ -133,50 +271,44 @@ class SSEPublisher:
                 async for event in self._get_missed_messages(topic, last_event_id):
                     yield event
             
-            # Main event loop with heartbeat
+            # Main event loop; heartbeats arrive through the queue from the
+            # shared timer, and None marks publisher shutdown
             while self._running:
-                try:
-                    # Wait for message with timeout for heartbeat
-                    message = await asyncio.wait_for(
-                        queue.get(),
-                        timeout=self._heartbeat_interval,
-                    )
-                    yield message
-                except asyncio.TimeoutError:
-                    # Send heartbeat
-                    yield {
-                        "type": "heartbeat",
-                        "data": {"timestamp": datetime.utcnow().isoformat()},
-                    }
+                message = await queue.get()
+                if message is None:
+                    break
+                yield message
                     
         finally:
             # Unregister subscription
-            self._subscriptions[topic].discard(queue)
-            if not self._subscriptions[topic]:
-                del self._subscriptions[topic]
+            remaining = tuple(q for q in self._subscriptions.get(topic, ()) if q is not queue)
+            if remaining:
+                self._subscriptions[topic] = remaining
+            else:
+                self._subscriptions.pop(topic, None)
     
     async def _get_missed_messages(
         self,
         topic: str,
         last_event_id: str,
-    ) -> AsyncGenerator[Dict[str, Any], None]:
-        """Get missed messages since last_event_id."""
-        messages = await self.cache.redis_client.lrange(f"sse:{topic}", 0, -1)
-        
-        # Parse event ID to get timestamp
-        try:
-            last_ts = datetime.fromisoformat(last_event_id)
-        except ValueError:
-            last_ts = None
+    ) -> AsyncGenerator[SSEMessage, None]:
+        """Get missed messages since last_event_id (a stream entry ID)."""
+        # Replay everything retained if the ID isn't a stream entry ID. Redis
+        # filters by ID; fetching newest-first bounds the reply at the replay
+        # size even when MAXLEN ~ has left extra entries in the stream.
+        start = f"({last_event_id}" if _STREAM_ID_RE.fullmatch(last_event_id) else "-"
+        entries = await self.cache.client.xrevrange(
+            _stream_key(topic), max="+", min=start, count=self._replay_size,
+        )
         
-        for msg_json in messages:
-            msg = json.loads(msg_json)
-            msg_ts = datetime.fromisoformat(msg.get("timestamp", ""))
-            
-            if last_ts and msg_ts <= last_ts:
-                continue
-            
-            yield msg
+        # Splice the entry ID into the stored JSON, as the publish script does,
+        # instead of decoding and re-encoding every replayed message
+        for entry_id, fields in reversed(entries):
+            yield SSEMessage(
+                id=entry_id,
+                type=fields.get("t", "message"),
+                payload=f'{{"id":"{entry_id}",{fields["m"][1:]}',
+            )
 
 
 # Global publisher instance
@@ -210,19 +342,13 @@ async def leaderboard_events(
         publisher = get_sse_publisher()
         
         try:
-            async for event in publisher.subscribe("leaderboard"):
-                # Check for client disconnect
-                if await request.is_disconnected():
-                    break
-                
-                # Apply anonymous mode
-                if anonymous and event.get("data"):
-                    event["data"] = _anonymize_leaderboard(event["data"])
-                
+            events = publisher.subscribe("leaderboard", request.headers.get("last-event-id"))
+            async for event in _until_disconnected(request, events):
+                # Apply anonymous mode (masked once per event, shared by all anonymous clients)
                 yield {
-                    "event": event.get("type", "message"),
-                    "data": json.dumps(event),
-                    "id": event.get("id"),
+                    "event": event.type,
+                    "data": event.anonymous_payload() if anonymous else event.payload,
+                    "id": event.id,
                 }
         except Exception as e:
             logger.exception("Leaderboard SSE error", error=str(e))
@@ -243,14 +369,12 @@ async def announcement_events(
         publisher = get_sse_publisher()
         
         try:
-            async for event in publisher.subscribe("announcements"):
-                if await request.is_disconnected():
-                    break
-                
+            events = publisher.subscribe("announcements", request.headers.get("last-event-id"))
+            async for event in _until_disconnected(request, events):
                 yield {
-                    "event": event.get("type", "message"),
-                    "data": json.dumps(event),
-                    "id": event.get("id"),
+                    "event": event.type,
+                    "data": event.payload,
+                    "id": event.id,
                 }
         except Exception as e:
             logger.exception("Announcements SSE error", error=str(e))
@@ -271,14 +395,12 @@ async def status_events(
         publisher = get_sse_publisher()
         
         try:
-            async for event in publisher.subscribe("status"):
-                if await request.is_disconnected():
-                    break
-                
+            events = publisher.subscribe("status", request.headers.get("last-event-id"))
+            async for event in _until_disconnected(request, events):
                 yield {
-                    "event": event.get("type", "message"),
-                    "data": json.dumps(event),
-                    "id": event.get("id"),
+                    "event": event.type,
+                    "data": event.payload,
+                    "id": event.id,
                 }
         except Exception as e:
             logger.exception("Status SSE error", error=str(e))
@@ -302,14 +424,12 @@ async def ad_events(
         publisher = get_sse_publisher()
         
         try:
-            async for event in publisher.subscribe(topic):
-                if await request.is_disconnected():
-                    break
-                
+            events = publisher.subscribe(topic, request.headers.get("last-event-id"))
+            async for event in _until_disconnected(request, events):
                 yield {
-                    "event": event.get("type", "message"),
-                    "data": json.dumps(event),
-                    "id": event.get("id"),
+                    "event": event.type,
+                    "data": event.payload,
+                    "id": event.id,
                 }
         except Exception as e:
             logger.exception("AD SSE error", error=str(e))
@@ -322,16 +442,54 @@ async def ad_events(
 # ============================================================================
 
 
-def _anonymize_leaderboard(data: Dict[str, Any]) -> Dict[str, Any]:
-    """Anonymize leaderboard data."""
-    if "entries" in data:
-        for entry in data["entries"]:
-            entry["team_name"] = f"Team {entry.get('team_id', '???')[:8]}"
-            if "members" in entry.get("members", []):
-                for member in entry["members"]:
-                    member["username"] = f"Player {member.get('user_id', '???')[:8]}"
+def _stream_key(topic: str) -> str:
+    """Get the Redis stream key holding a topic's replay buffer."""
+    return f"sse:stream:{topic}"
+
+
+async def _until_disconnected(
+    request: Request,
+    events: AsyncGenerator[SSEMessage, None],
+) -> AsyncGenerator[SSEMessage, None]:
+    """
+    Pass events through until the client disconnects.
     
-    return data
+    The disconnect check is an ASGI receive round-trip, so it runs at most
+    once per interval rather than per event; EventSourceResponse also
+    cancels the stream on disconnect by itself.
+    """
+    next_check = time.monotonic() + _DISCONNECT_CHECK_INTERVAL
+    try:
+        async for event in events:
+            now = time.monotonic()
+            if now >= next_check:
+                if await request.is_disconnected():
+                    break
+                next_check = now + _DISCONNECT_CHECK_INTERVAL
+            yield event
+    finally:
+        # Unregister the subscription now rather than when it is collected
+        await events.aclose()
+
+
+def _anonymize_leaderboard(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Anonymize leaderboard data, returning copies rather than mutating it."""
+    entries = data.get("entries")
+    if not entries:
+        return data
+    return {**data, "entries": [_anonymize_entry(entry) for entry in entries]}
+
+
+def _anonymize_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Mask the team name and member usernames of one leaderboard entry."""
+    out = {**entry, "team_name": f"Team {entry.get('team_id', '???')[:8]}"}
+    members = entry.get("members")
+    if members:
+        out["members"] = [
+            {**member, "username": f"Player {member.get('user_id', '???')[:8]}"}
+            for member in members
+        ]
+    return out
 
 
 # ============================================================================
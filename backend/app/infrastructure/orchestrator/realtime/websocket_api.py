@@ -8,11 +8,11 @@ FastAPI WebSocket endpoints for real-time communications:
 - Rate limiting enforcement
 """
 
-import json
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
 from uuid import UUID
 
+import orjson
 import structlog
 from fastapi import APIRouter, Cookie, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.websockets import WebSocketState
@@ -20,7 +20,8 @@ from fastapi.websockets import WebSocketState
 from app.core.config import Settings, get_settings
 from app.infrastructure.cache import CacheManager
 from app.infrastructure.database import DatabaseManager
-from app.infrastructure.orchestrator.realtime.middleware.auth import WSAuthMiddleware
+from app.infrastructure.orchestrator.realtime.clock import utc_isoformat
+from app.infrastructure.orchestrator.realtime.middleware.auth import WSAuthMiddleware, WSConnectionState
 from app.infrastructure.orchestrator.realtime.server import (
     EventMessage,
     EventType,
@@ -34,6 +35,40 @@ logger = structlog.get_logger(__name__)
 ws_router = APIRouter()
 
 
+# Parameterless control frames, matched verbatim so they skip JSON parsing.
+# The parsed dicts are shared and must be treated as read-only.
+_CONTROL_FRAMES: Dict[str, Dict[str, Any]] = {
+    frame: {"type": "ping"}
+    for frame in ('{"type":"ping"}', '{"type": "ping"}')
+}
+
+# Fixed-shape outbound frames, encoded once. Clients read text frames, so
+# these stay str; timestamps and retry counts need no JSON escaping.
+_INVALID_JSON_FRAME = '{"type":"error","message":"Invalid JSON"}'
+_AUTH_REQUIRED_FRAME = '{"type":"error","message":"Authentication required"}'
+_RATE_LIMIT_TPL = '{"type":"error","message":"Rate limit exceeded","retry_after":%d}'
+_PONG_TPL = '{"type":"pong","timestamp":"%s"}'
+
+# Rate-limit bucket shared by every unrecognised message type
+_UNKNOWN_TYPE_BUCKET = "unknown"
+
+# Frames larger than this are parsed in the default executor so a near-limit
+# payload does not stall every other connection on the loop.
+_INLINE_PARSE_LIMIT = 4096
+
+
+def _parse_rooms(rooms: Optional[str]) -> Tuple[str, ...]:
+    """Split a comma-separated rooms parameter, dropping blanks and duplicates."""
+    if not rooms:
+        return ()
+    return tuple(dict.fromkeys(room for room in map(str.strip, rooms.split(",")) if room))
+
+
+def _encode(payload: Dict[str, Any]) -> str:
+    """Encode a dynamic outbound frame with orjson."""
+    return orjson.dumps(payload).decode()
+
+
 # ============================================================================
 # WebSocket Connection Manager
 # ============================================================================
@@ -50,12 +85,22 @@ class WebSocketManager:
         self.realtime = realtime_server
         self.auth = auth_middleware
         self._connection_tasks: Dict[str, Any] = {}
+        
+        # Inbound message handlers, keyed by message type
+        self._handlers: Dict[str, Callable[..., Awaitable[None]]] = {
+            "subscribe": self._handle_subscribe,
+            "unsubscribe": self._handle_unsubscribe,
+            "ping": self._handle_ping,
+            "challenge_attempt": self._handle_challenge_attempt,
+            "set_presence": self._handle_presence,
+        }
     
     async def handle_connection(
         self,
         websocket: WebSocket,
         token: Optional[str] = None,
-        rooms: Optional[List[str]] = None,
+        rooms: Optional[Sequence[str]] = None,
+        state: Optional[WSConnectionState] = None,
     ) -> None:
         """
         Handle a new WebSocket connection.
@@ -64,12 +109,14 @@ class WebSocketManager:
             websocket: WebSocket connection
             token: JWT token for authentication
             rooms: Initial rooms to subscribe to
+            state: Connection state if the caller already authenticated
         """
         connection_id = None
         
         try:
-            # Authenticate connection
-            state = await self.auth.authenticate_connection(websocket, token)
+            # Authenticate connection (unless the endpoint already did)
+            if state is None:
+                state = await self.auth.authenticate_connection(websocket, token)
             
             if state.is_anonymous and not token:
                 # Anonymous connection - no auth required
@@ -121,43 +168,38 @@ class WebSocketManager:
         """Handle incoming WebSocket messages."""
         while True:
             try:
-                # Wait for message with heartbeat
-                message = await asyncio.wait_for(
-                    websocket.receive_text(),
-                    timeout=30.0,
-                )
+                # Heartbeats are sent by the realtime server's shared timer
+                message = await websocket.receive_text()
                 
                 # Update last activity
-                state.last_activity = datetime.utcnow().isoformat()
+                state.last_activity = utc_isoformat()
                 
                 # Validate message size
                 is_valid, error = self.auth.validate_payload_size(message)
                 if not is_valid:
-                    await websocket.send_json({
+                    await websocket.send_text(_encode({
                         "type": "error",
                         "message": error,
-                    })
+                    }))
                     continue
                 
-                # Parse and process message
-                try:
-                    data = json.loads(message)
-                except json.JSONDecodeError:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": "Invalid JSON",
-                    })
-                    continue
+                # Parse and process message (control frames are pre-parsed)
+                data = _CONTROL_FRAMES.get(message)
+                if data is None:
+                    try:
+                        if len(message) > _INLINE_PARSE_LIMIT:
+                            data = await asyncio.get_running_loop().run_in_executor(
+                                None, orjson.loads, message
+                            )
+                        else:
+                            data = orjson.loads(message)
+                    except orjson.JSONDecodeError:
+                        await websocket.send_text(_INVALID_JSON_FRAME)
+                        continue
                 
                 # Process based on type
                 await self._process_message(websocket, state, user_info, data)
                 
-            except asyncio.TimeoutError:
-                # Send heartbeat
-                await websocket.send_json({
-                    "type": "heartbeat",
-                    "timestamp": datetime.utcnow().isoformat(),
-                })
             except WebSocketDisconnect:
                 break
             except Exception as e:
@@ -174,39 +216,35 @@ class WebSocketManager:
         """Process an incoming message."""
         msg_type = data.get("type")
         
-        # Rate limiting
-        allowed, retry_after = self.auth.check_rate_limit(state.connection_id, msg_type)
+        # Non-string types (possibly unhashable) are simply unknown
+        handler = self._handlers.get(msg_type) if isinstance(msg_type, str) else None
+        
+        # Rate limiting; unknown types share one bucket so clients cannot
+        # get fresh limits (or new Redis keys) by inventing message types
+        bucket = msg_type if handler is not None else _UNKNOWN_TYPE_BUCKET
+        allowed, retry_after = await self.auth.check_shared_rate_limit(user_info.user_id_str, bucket)
         if not allowed:
-            await websocket.send_json({
-                "type": "error",
-                "message": "Rate limit exceeded",
-                "retry_after": retry_after,
-            })
+            await websocket.send_text(_RATE_LIMIT_TPL % retry_after)
             return
         
-        if msg_type == "subscribe":
-            await self._handle_subscribe(websocket, state, user_info, data)
-        
-        elif msg_type == "unsubscribe":
-            await self._handle_unsubscribe(websocket, state, user_info, data)
-        
-        elif msg_type == "ping":
-            await websocket.send_json({
-                "type": "pong",
-                "timestamp": datetime.utcnow().isoformat(),
-            })
-        
-        elif msg_type == "challenge_attempt":
-            await self._handle_challenge_attempt(websocket, state, user_info, data)
-        
-        elif msg_type == "set_presence":
-            await self._handle_presence(websocket, state, data)
-        
-        else:
-            await websocket.send_json({
+        if handler is None:
+            await websocket.send_text(_encode({
                 "type": "error",
                 "message": f"Unknown message type: {msg_type}",
-            })
+            }))
+            return
+        
+        await handler(websocket, state, user_info, data)
+    
+    async def _handle_ping(
+        self,
+        websocket: WebSocket,
+        state: Any,
+        user_info: UserInfo,
+        data: Dict[str, Any],
+    ) -> None:
+        """Handle heartbeat ping."""
+        await websocket.send_text(_PONG_TPL % utc_isoformat())
     
     async def _handle_subscribe(
         self,
@@ -216,24 +254,18 @@ class WebSocketManager:
         data: Dict[str, Any],
     ) -> None:
         """Handle room subscription."""
-        channels = data.get("channels", [])
-        subscribed = []
-        failed = []
+        subscribed, failed = self.auth.validate_room_access_bulk(
+            state, data.get("channels", []),
+        )
         
-        for channel in channels:
-            # Check authorization
-            if self.auth.validate_room_access(state, channel):
-                await self.realtime._join_room(websocket, channel, user_info.username)
-                state.subscribed_rooms.append(channel)
-                subscribed.append(channel)
-            else:
-                failed.append(channel)
+        self.realtime.join_rooms(websocket, subscribed, user_info.username)
+        state.subscribed_rooms.update(subscribed)
         
-        await websocket.send_json({
+        await websocket.send_text(_encode({
             "type": "subscribed",
             "channels": subscribed,
             "failed": failed,
-        })
+        }))
     
     async def _handle_unsubscribe(
         self,
@@ -245,17 +277,13 @@ class WebSocketManager:
         """Handle room unsubscription."""
         channels = data.get("channels", [])
         
-        for channel in channels:
-            if channel in self.realtime._connections:
-                self.realtime._connections[channel].discard(websocket)
-            
-            if channel in state.subscribed_rooms:
-                state.subscribed_rooms.remove(channel)
+        self.realtime.leave_rooms(websocket, channels)
+        state.subscribed_rooms.difference_update(channels)
         
-        await websocket.send_json({
+        await websocket.send_text(_encode({
             "type": "unsubscribed",
             "channels": channels,
-        })
+        }))
     
     async def _handle_challenge_attempt(
         self,
@@ -266,19 +294,16 @@ class WebSocketManager:
     ) -> None:
         """Handle challenge submission attempt."""
         if user_info.is_anonymous:
-            await websocket.send_json({
-                "type": "error",
-                "message": "Authentication required",
-            })
+            await websocket.send_text(_AUTH_REQUIRED_FRAME)
             return
         
         # Validate message
         is_valid, error = self.auth.validate_message_schema(data, "challenge_attempt")
         if not is_valid:
-            await websocket.send_json({
+            await websocket.send_text(_encode({
                 "type": "error",
                 "message": error,
-            })
+            }))
             return
         
         # Emit event for processing
@@ -286,38 +311,54 @@ class WebSocketManager:
             type=EventType.CHALLENGE_ATTEMPT.value,
             channel="challenges",
             data={
-                "user_id": str(user_info.user_id),
-                "team_id": str(user_info.team_id) if user_info.team_id else None,
+                "user_id": user_info.user_id_str,
+                "team_id": user_info.team_id_str,
                 "challenge_id": data.get("challenge_id"),
                 "submission": data.get("submission"),
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": utc_isoformat(),
             },
         )
         
         # Send acknowledgment
-        await websocket.send_json({
+        await websocket.send_text(_encode({
             "type": "challenge_attempt_received",
             "challenge_id": data.get("challenge_id"),
             "status": "pending",
-        })
+        }))
     
     async def _handle_presence(
         self,
         websocket: WebSocket,
         state: Any,
+        user_info: UserInfo,
         data: Dict[str, Any],
     ) -> None:
         """Handle presence update."""
         status = data.get("status", "online")
         
-        await websocket.send_json({
+        await websocket.send_text(_encode({
             "type": "presence_updated",
             "status": status,
-            "timestamp": datetime.utcnow().isoformat(),
-        })
+            "timestamp": utc_isoformat(),
+        }))
 
 
-import asyncio
+# Shared manager; connection state lives in handle_connection locals
+_ws_manager: Optional[WebSocketManager] = None
+
+
+def get_ws_manager() -> WebSocketManager:
+    """Get or create the WebSocket manager singleton.
+    
+    Rebuilt if the realtime server's Redis client has changed since the
+    manager was created (e.g. it was first used before start()).
+    """
+    global _ws_manager
+    realtime = get_realtime_server()
+    if _ws_manager is None or _ws_manager.auth.redis is not realtime.redis:
+        auth = WSAuthMiddleware(get_settings(), redis=realtime.redis)
+        _ws_manager = WebSocketManager(realtime, auth)
+    return _ws_manager
 
 
 # ============================================================================
@@ -347,17 +388,7 @@ async def websocket_endpoint(
     """
     await websocket.accept()
     
-    # Parse rooms
-    room_list = rooms.split(",") if rooms else []
-    
-    # Get managers
-    realtime = get_realtime_server()
-    settings = get_settings()
-    auth = WSAuthMiddleware(settings)
-    
-    manager = WebSocketManager(realtime, auth)
-    
-    await manager.handle_connection(websocket, token, room_list)
+    await get_ws_manager().handle_connection(websocket, token, _parse_rooms(rooms))
 
 
 @ws_router.websocket("/ws/admin")
@@ -377,12 +408,10 @@ async def websocket_admin_endpoint(
     """
     await websocket.accept()
     
-    realtime = get_realtime_server()
-    settings = get_settings()
-    auth = WSAuthMiddleware(settings)
+    manager = get_ws_manager()
     
     # Authenticate
-    state = await auth.authenticate_connection(websocket, token)
+    state = await manager.auth.authenticate_connection(websocket, token)
     
     if state.role not in ["admin", "superadmin"]:
         await websocket.send_json({
@@ -392,9 +421,8 @@ async def websocket_admin_endpoint(
         await websocket.close()
         return
     
-    # Subscribe to admin room
-    manager = WebSocketManager(realtime, auth)
-    await manager.handle_connection(websocket, token, ["admin", "global"])
+    # Subscribe to admin room, reusing the state authenticated above
+    await manager.handle_connection(websocket, token, ["admin", "global"], state=state)
 
 
 @ws_router.websocket("/ws/ad/{game_id}")
@@ -416,16 +444,10 @@ async def websocket_ad_endpoint(
     """
     await websocket.accept()
     
-    realtime = get_realtime_server()
-    settings = get_settings()
-    auth = WSAuthMiddleware(settings)
-    
-    manager = WebSocketManager(realtime, auth)
-    
     # Subscribe to game-specific room
     room_list = [f"ad:{game_id}", "global"]
     
-    await manager.handle_connection(websocket, token, room_list)
+    await get_ws_manager().handle_connection(websocket, token, room_list)
 
 
 # ============================================================================
@@ -0,0 +1,132 @@
+"""
+Unit tests for realtime event coalescing.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.infrastructure.orchestrator.realtime.server import (
+    EventMessage,
+    EventType,
+    NotificationPriority,
+    RealtimeServer,
+    _merge_leaderboard_diffs,
+)
+
+
+def _diff(*rows):
+    """Leaderboard diff data from (team_id, old_position, new_position) rows."""
+    return {
+        "type": "diff",
+        "entries": [
+            {
+                "team_id": team_id,
+                "old_position": old_position,
+                "new_position": new_position,
+                "entry": {"team_id": team_id, "position": new_position},
+            }
+            for team_id, old_position, new_position in rows
+        ],
+        "total_teams": 10,
+    }
+
+
+class TestMergeLeaderboardDiffs:
+    """Tests for merging consecutive leaderboard diffs."""
+    
+    def test_rows_keep_first_old_and_last_new_position(self):
+        """A team changed twice reports its original and latest positions."""
+        merged = _merge_leaderboard_diffs(
+            _diff(("a", 5, 3), ("b", 3, 4)),
+            _diff(("a", 3, 1), ("c", 1, 2)),
+        )
+        
+        rows = {row["team_id"]: row for row in merged["entries"]}
+        assert rows["a"]["old_position"] == 5
+        assert rows["a"]["new_position"] == 1
+        assert rows["a"]["entry"]["position"] == 1
+        assert (rows["b"]["old_position"], rows["b"]["new_position"]) == (3, 4)
+        assert (rows["c"]["old_position"], rows["c"]["new_position"]) == (1, 2)
+    
+    def test_full_snapshot_replaces_diff(self):
+        """A full snapshot supersedes the pending diff."""
+        full = {"type": "full", "entries": []}
+        assert _merge_leaderboard_diffs(_diff(("a", 2, 1)), full) is full
+    
+    def test_untyped_data_is_not_merged(self):
+        """Data without a diff type cannot be merged."""
+        assert _merge_leaderboard_diffs({"entries": []}, _diff(("a", 2, 1))) is None
+
+
+class TestCoalesce:
+    """Tests for RealtimeServer._coalesce."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.server = RealtimeServer(settings=SimpleNamespace(redis_url="redis://test"))
+        self.server._coalesce_interval = 0
+        self.sent = []
+        
+        async def broadcast(event, rooms=None):
+            self.sent.append((event, rooms))
+        
+        self.server.broadcast = broadcast
+    
+    async def _flush(self):
+        """Wait for the pending coalescing window to be sent."""
+        await self.server._flush_task
+    
+    def _event(self, event_type, data, priority=NotificationPriority.NORMAL.value):
+        """Build a leaderboard channel event."""
+        return EventMessage(type=event_type, channel="leaderboard", priority=priority, data=data)
+    
+    @pytest.mark.asyncio
+    async def test_diffs_in_one_window_are_merged(self):
+        """Diffs for the same rooms are sent once, carrying every change."""
+        diff = EventType.LEADERBOARD_DIFF.value
+        await self.server._coalesce(self._event(diff, _diff(("a", 3, 2))), ["leaderboard"])
+        await self.server._coalesce(self._event(diff, _diff(("b", 2, 3))), ["leaderboard"])
+        await self._flush()
+        
+        assert len(self.sent) == 1
+        event, rooms = self.sent[0]
+        assert rooms == ["leaderboard"]
+        assert {row["team_id"] for row in event.data["entries"]} == {"a", "b"}
+    
+    @pytest.mark.asyncio
+    async def test_full_update_drops_pending_diff(self):
+        """A full leaderboard update supersedes a pending diff."""
+        await self.server._coalesce(
+            self._event(EventType.LEADERBOARD_DIFF.value, _diff(("a", 3, 2))), ["leaderboard"],
+        )
+        update = self._event(EventType.LEADERBOARD_UPDATE.value, {"entries": []})
+        await self.server._coalesce(update, ["leaderboard"])
+        await self._flush()
+        
+        assert [event for event, _ in self.sent] == [update]
+    
+    @pytest.mark.asyncio
+    async def test_unmergeable_diff_sends_pending_first(self):
+        """A diff that cannot be merged flushes the pending one, in order."""
+        diff = EventType.LEADERBOARD_DIFF.value
+        first = self._event(diff, {"entries": []})
+        second = self._event(diff, _diff(("a", 3, 2)))
+        await self.server._coalesce(first, ["leaderboard"])
+        await self.server._coalesce(second, ["leaderboard"])
+        await self._flush()
+        
+        assert [event for event, _ in self.sent] == [first, second]
+    
+    @pytest.mark.asyncio
+    async def test_urgent_events_are_not_buffered(self):
+        """Urgent events are broadcast immediately."""
+        event = self._event(
+            EventType.LEADERBOARD_DIFF.value,
+            _diff(("a", 3, 2)),
+            priority=NotificationPriority.URGENT.value,
+        )
+        await self.server._coalesce(event, ["leaderboard"])
+        
+        assert self.sent == [(event, ["leaderboard"])]
+        assert self.server._flush_task is None
@@ -0,0 +1,78 @@
+"""
+Unit tests for realtime leaderboard diffs.
+"""
+
+import random
+from uuid import uuid4
+
+import pytest
+
+from app.infrastructure.orchestrator.realtime.handlers.leaderboard import LeaderboardHandler
+
+
+def _ranked(scores):
+    """Build leaderboard entries in rank order; tied teams share a position."""
+    order = sorted(scores, key=lambda team_id: (-scores[team_id], team_id))
+    return [
+        {
+            "team_id": team_id,
+            "total_points": scores[team_id],
+            "position": 1 + sum(1 for other in scores.values() if other > scores[team_id]),
+        }
+        for team_id in order
+    ]
+
+
+def _handler():
+    handler = LeaderboardHandler(db_manager=None, static_scoring=True)
+    handler.set_diff_threshold(1)
+    return handler
+
+
+class TestLeaderboardDiff:
+    """Tests for LeaderboardHandler.compute_diff."""
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("seed", range(50))
+    async def test_ranged_diff_matches_full_scan(self, seed):
+        """A single-solve ranged diff should equal a full-scan diff."""
+        rng = random.Random(seed)
+        scores = {f"team{i:02d}": rng.choice([0, 100, 200, 300]) for i in range(20)}
+        
+        ranged, full = _handler(), _handler()
+        await ranged.compute_diff(_ranked(scores))
+        await full.compute_diff(_ranked(scores))
+        
+        for _ in range(5):
+            solver = rng.choice(sorted(scores))
+            scores[solver] += rng.choice([50, 100, 200])
+            entries = _ranked(scores)
+            
+            ranged_diff = await ranged.compute_diff(entries, changed_team_id=solver)
+            full_diff = await full.compute_diff(entries)
+            
+            key = lambda row: row["team_id"]
+            assert sorted(ranged_diff["entries"], key=key) == sorted(full_diff["entries"], key=key)
+            assert ranged._previous_positions == full._previous_positions
+            assert ranged._previous_indices == full._previous_indices
+    
+    @pytest.mark.asyncio
+    async def test_solve_without_static_scoring_scans_everything(self):
+        """Without static scoring the solver is not passed to compute_diff."""
+        handler = LeaderboardHandler(db_manager=None, static_scoring=False)
+        handler.set_diff_threshold(1)
+        seen = {}
+        
+        async def fake_leaderboard():
+            return {"entries": []}
+        
+        async def fake_diff(entries, changed_team_id=None):
+            seen["changed_team_id"] = changed_team_id
+            return {}
+        
+        handler.get_current_leaderboard = fake_leaderboard
+        handler.compute_diff = fake_diff
+        
+        await handler.handle_challenge_solve(uuid4(), uuid4(), 100)
+        
+        assert seen["changed_team_id"] is None
@@ -0,0 +1,128 @@
+"""
+Unit tests for realtime notifications.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from fakeredis import aioredis
+
+from app.infrastructure.orchestrator.realtime.handlers.notifications import (
+    Notification,
+    NotificationsHandler,
+)
+
+
+class TestDoNotDisturb:
+    """Tests for DND state and its local cache."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.redis = aioredis.FakeRedis(decode_responses=True)
+        self.handler = NotificationsHandler(
+            db_manager=None,
+            cache_manager=SimpleNamespace(redis_client=self.redis),
+        )
+        self.user_id = uuid4()
+    
+    @pytest.mark.asyncio
+    async def test_indefinite_dnd(self):
+        """DND without an end stays on until disabled."""
+        await self.handler.set_dnd(self.user_id, True)
+        assert await self.handler._is_in_dnd(self.user_id)
+        
+        await self.handler.set_dnd(self.user_id, False)
+        assert not await self.handler._is_in_dnd(self.user_id)
+    
+    @pytest.mark.asyncio
+    async def test_cached_dnd_ends_at_expiry(self, monkeypatch):
+        """A cached DND entry ends at its Redis expiry, not the cache TTL."""
+        other_worker = NotificationsHandler(
+            db_manager=None,
+            cache_manager=SimpleNamespace(redis_client=self.redis),
+        )
+        now = time.time()
+        # Naive timestamps are UTC
+        expires_at = datetime.fromtimestamp(now + 5, tz=timezone.utc).replace(tzinfo=None)
+        await self.handler.set_dnd(self.user_id, True, expires_at=expires_at)
+        
+        assert await other_worker._get_dnd_flags([self.user_id]) == [True]
+        assert await other_worker._is_in_dnd(self.user_id)
+        
+        # Both entries are still in the 30s local cache, but DND is over
+        monkeypatch.setattr(time, "time", lambda: now + 10)
+        assert not await self.handler._is_in_dnd(self.user_id)
+        assert await other_worker._get_dnd_flags([self.user_id]) == [False]
+        assert other_worker.get_stats()["dnd_users_count"] == 0
+
+
+class TestNotificationStorage:
+    """Tests for the notification save and mark-read scripts."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.redis = aioredis.FakeRedis(decode_responses=True)
+        self.handler = NotificationsHandler(
+            db_manager=None,
+            cache_manager=SimpleNamespace(redis_client=self.redis),
+        )
+        self.user_id = uuid4()
+        self.key = f"notifications:{self.user_id}"
+    
+    async def _save(self, **kwargs):
+        """Save a notification for the test user."""
+        notification = Notification(user_id=self.user_id, data={"read": False}, **kwargs)
+        await self.handler._save_notification(notification)
+        return notification
+    
+    @pytest.mark.asyncio
+    async def test_mark_as_read_patches_payload_in_place(self):
+        """Only the read flag changes; the rest of the payload is byte-identical."""
+        notification = await self._save(title="Hello", message="naïve \"quoted\"")
+        before = await self.redis.hget(self.key, notification.id)
+        
+        assert await self.handler.mark_as_read(self.user_id, notification.id)
+        after = await self.redis.hget(self.key, notification.id)
+        
+        assert before.startswith('{"read":false,')
+        assert after == '{"read":true,' + before[len('{"read":false,'):]
+        stored = Notification._from_bytes(after)
+        assert stored.read
+        assert stored.data == {"read": False}
+        
+        # Marking again leaves it alone
+        assert await self.handler.mark_as_read(self.user_id, notification.id)
+        assert await self.redis.hget(self.key, notification.id) == after
+    
+    @pytest.mark.asyncio
+    async def test_mark_as_read_unknown_id(self):
+        """Unknown notifications report not found."""
+        assert not await self.handler.mark_as_read(self.user_id, "missing")
+    
+    @pytest.mark.asyncio
+    async def test_mark_all_read_counts_unread(self):
+        """mark_all_read flips only unread notifications and counts them."""
+        first = await self._save(title="first")
+        await self._save(title="second")
+        await self.handler.mark_as_read(self.user_id, first.id)
+        
+        assert await self.handler.mark_all_read(self.user_id) == 1
+        assert await self.handler.mark_all_read(self.user_id) == 0
+        assert await self.handler.get_user_notifications(self.user_id, unread_only=True) == []
+    
+    @pytest.mark.asyncio
+    async def test_save_caps_per_user(self):
+        """Saving beyond the per-user cap drops the oldest notifications."""
+        self.handler._max_notifications_per_user = 2
+        start = datetime.utcnow()
+        saved = [
+            await self._save(title=str(i), created_at=start + timedelta(seconds=i))
+            for i in range(3)
+        ]
+        
+        notifications = await self.handler.get_user_notifications(self.user_id)
+        assert {n.id for n in notifications} == {saved[1].id, saved[2].id}
+        assert await self.redis.hlen(self.key) == 2
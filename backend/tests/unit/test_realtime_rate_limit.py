@@ -0,0 +1,65 @@
+"""
+Unit tests for realtime WebSocket rate limiting.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from fakeredis import aioredis
+
+from app.infrastructure.orchestrator.realtime.middleware.auth import WSAuthMiddleware
+
+
+SETTINGS = SimpleNamespace(
+    secret_key="test-secret",
+    access_token_expire_minutes=30,
+    cors_origins=[],
+)
+
+
+class TestSharedRateLimit:
+    """Tests for the Redis-backed token bucket."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.redis = aioredis.FakeRedis(decode_responses=True)
+        self.auth = self._new_worker()
+    
+    def _new_worker(self):
+        """A worker process connected to the shared Redis."""
+        auth = WSAuthMiddleware(settings=SETTINGS, redis=self.redis)
+        auth.rate_limit_burst = 3
+        return auth
+    
+    @pytest.mark.asyncio
+    async def test_burst_then_denied(self):
+        """A user gets burst-capacity events, then a retry hint."""
+        results = [await self.auth.check_shared_rate_limit("user-1", "ping") for _ in range(4)]
+        assert results[:3] == [(True, 0)] * 3
+        allowed, retry_after = results[3]
+        assert not allowed
+        assert retry_after >= 1
+    
+    @pytest.mark.asyncio
+    async def test_bucket_shared_across_workers(self):
+        """Connections of one user on different workers draw from one bucket."""
+        other = self._new_worker()
+        for _ in range(3):
+            assert (await other.check_shared_rate_limit("user-1", "ping"))[0]
+        allowed, _ = await self.auth.check_shared_rate_limit("user-1", "ping")
+        assert not allowed
+    
+    @pytest.mark.asyncio
+    async def test_buckets_per_user_and_event(self):
+        """Other users and other event types have their own buckets."""
+        for _ in range(3):
+            await self.auth.check_shared_rate_limit("user-1", "ping")
+        assert (await self.auth.check_shared_rate_limit("user-2", "ping"))[0]
+        assert (await self.auth.check_shared_rate_limit("user-1", "subscribe"))[0]
+    
+    @pytest.mark.asyncio
+    async def test_bucket_expires(self):
+        """Bucket keys carry a TTL so idle users leave nothing behind."""
+        await self.auth.check_shared_rate_limit("user-1", "ping")
+        ttl = await self.redis.ttl("rl:user-1:ping")
+        assert 0 < ttl <= self.auth.rate_limit_window * 2
@@ -0,0 +1,71 @@
+"""
+Unit tests for SSE event publishing.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from fakeredis import aioredis
+
+from app.infrastructure.orchestrator.realtime.sse import SSEPublisher, _PUBLISH_LUA
+
+
+class TestSSEPublish:
+    """Tests for the publish script and local delivery."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.redis = aioredis.FakeRedis(decode_responses=True)
+        self.publisher = SSEPublisher(SimpleNamespace(client=self.redis))
+        self.publisher._publish_script = self.redis.register_script(_PUBLISH_LUA)
+    
+    async def _publish_and_receive(self, topic, event_type, data):
+        """Publish an event and return the raw pub/sub message."""
+        pubsub = self.redis.pubsub()
+        await pubsub.psubscribe("sse:*")
+        await pubsub.get_message(timeout=1)  # psubscribe confirmation
+        event_id = await self.publisher.publish(topic, event_type, data)
+        message = await pubsub.get_message(timeout=1)
+        await pubsub.close()
+        return event_id, message
+    
+    @pytest.mark.asyncio
+    async def test_publish_stores_and_announces(self):
+        """The event is added to the replay stream and published with its ID."""
+        event_id, message = await self._publish_and_receive(
+            "leaderboard", "leaderboard.update", {"entries": []},
+        )
+        
+        assert message["channel"] == "sse:leaderboard"
+        header_id, header_type, payload = message["data"].split("\n", 2)
+        assert header_id == event_id
+        assert header_type == "leaderboard.update"
+        body = orjson.loads(payload)
+        assert body["id"] == event_id
+        assert body["type"] == "leaderboard.update"
+        assert body["data"] == {"entries": []}
+        
+        stream = await self.redis.xrange("sse:stream:leaderboard")
+        assert [entry_id for entry_id, _ in stream] == [event_id]
+    
+    @pytest.mark.asyncio
+    async def test_deliver_forwards_payload_unchanged(self):
+        """Subscribers get the published JSON as-is, with ID and type from the header."""
+        event_id, message = await self._publish_and_receive(
+            "announcements", "announcement", {"text": "héllo"},
+        )
+        queue = asyncio.Queue(maxsize=4)
+        self.publisher._subscriptions["announcements"] = (queue,)
+        
+        assert self.publisher._deliver("announcements", message["data"]) == 1
+        
+        event = queue.get_nowait()
+        assert event.id == event_id
+        assert event.type == "announcement"
+        assert event.payload == message["data"].split("\n", 2)[2]
+    
+    def test_deliver_without_subscribers(self):
+        """Topics nobody on this worker follows are skipped."""
+        assert self.publisher._deliver("nobody", "1-0\nping\n{}") == 0